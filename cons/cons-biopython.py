@@ -6,17 +6,39 @@ matrix for the collection".
 """
 
 import argparse
+from itertools import islice
+import os
+import sys
 from Bio import SeqIO
 from Bio import motifs
 from Bio.Alphabet import generic_dna
 
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import open_text  # noqa: E402
+
 
 def main(args):
     """Consensus and Profile"""
 
-    seqs = [record.seq for record in SeqIO.parse(args.dataset, 'fasta',
-                                                 generic_dna)]
-    profile = motifs.create(seqs)
+    # Count a chunk of records at a time rather than holding every sequence
+    records = instrument.iterate(
+        'parse', SeqIO.parse(open_text(args.dataset), 'fasta', generic_dna))
+    counts = None
+    while True:
+        seqs = [record.seq for record in islice(records, args.chunk_size)]
+        if not seqs:
+            break
+        chunk_counts = motifs.create(seqs).counts
+        if counts is None:
+            counts = dict((base, list(chunk_counts[base])) for base in 'ACGT')
+        else:
+            for base in 'ACGT':
+                counts[base] = [count1 + count2 for count1, count2
+                                in zip(counts[base], chunk_counts[base])]
+
+    profile = motifs.Motif(alphabet='ACGT', counts=counts)
     print(profile.consensus)
     for base in 'ACGT':
         print(base + ':',
@@ -28,6 +50,10 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A collection of at most 10 DNA strings of equal length '
         '(at most 1 kbp) in FASTA format')
+    parser.add_argument(
+        '--chunk-size', metavar='RECORDS', type=int, default=10000,
+        help='Number of records counted at a time (default: 10000)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
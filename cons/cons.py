@@ -7,14 +7,39 @@ matrix for the collection".
 
 import argparse
 from collections import defaultdict
+from itertools import islice
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import read_fasta, read_fasta_bytes  # noqa: E402
+from rosalind.parallel import imap  # noqa: E402
+
+# Rows of NumPy profile (any other symbol is counted as N)
+BASES = 'ACGTN'
+
+# NumPy and its table of profile row for each byte, imported only for
+# --numpy (importing NumPy takes longer than solving most datasets)
+np = None
+ROW_FOR = None
 
 
 def main(args):
     """Consensus and Profile"""
 
+    if args.numpy:
+        profile = get_profile_numpy(args.dataset, args.chunk_size,
+                                    args.processes)
+        print(''.join(BASES[row] for row in profile.argmax(axis=0)))
+        for row, base in enumerate('ACGT'):
+            print(base + ':', ' '.join(str(count) for count in profile[row]))
+        return
+
     # Construct profile
     profile = []
-    for _, seq in read_fasta(args.dataset):
+    for _, seq in instrument.iterate('parse', read_fasta(args.dataset)):
         for i, base in enumerate(seq):
             if i >= len(profile):
                 profile.append(defaultdict(int))
@@ -25,22 +50,79 @@ def main(args):
         print(base + ':', ' '.join(str(counts[base]) for counts in profile))
 
 
-def read_fasta(file):
-    """Read FASTA file record by record"""
+def import_numpy():
+    """Import NumPy if available, getting whether it is"""
+
+    global np, ROW_FOR
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+        ROW_FOR = np.full(256, BASES.index('N'), dtype=np.uint8)
+        for row, base in enumerate(BASES):
+            ROW_FOR[ord(base)] = row
+    return True
+
+
+def get_profile_numpy(file, chunk_size, processes):
+    """Construct (bases x positions) profile array chunk by chunk"""
+
+    profile = np.zeros((len(BASES), 0), dtype=np.int64)
+    seqs = (seq for _, seq
+            in instrument.iterate('parse', read_fasta_bytes(file)))
+
+    if processes > 1:
+        chunks = ([bytes(seq) for seq in chunk]
+                  for chunk in get_chunks(seqs, chunk_size))
+    else:
+        chunks = get_chunks(seqs, chunk_size)
+    for partial in imap(count_chunk, chunks, processes, ordered=False):
+        profile = add_profiles(profile, partial)
+
+    return profile
+
+
+def get_chunks(seqs, chunk_size):
+    """Get lists of sequences chunk by chunk"""
 
-    id = None
-    seq = []
-    for line in file:
-        line = line.rstrip()
-        if line.startswith('>'):
-            if id:
-                yield(id, ''.join(seq))
-            id = line.lstrip('>')
-            seq = []
-        else:
-            seq.append(line)
-    if id:
-        yield(id, ''.join(seq))
+    while True:
+        chunk = list(islice(seqs, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def count_chunk(seqs):
+    """Construct profile array for a chunk of sequences"""
+
+    import_numpy()  # In case a worker process didn't inherit it
+    length = max(len(seq) for seq in seqs)
+    padding = len(BASES)
+    if all(len(seq) == length for seq in seqs):
+        rows = ROW_FOR[np.frombuffer(b''.join(seqs), dtype=np.uint8)]
+        rows = rows.reshape(len(seqs), length)
+    else:
+        rows = np.full((len(seqs), length), padding, dtype=np.uint8)
+        for i, seq in enumerate(seqs):
+            rows[i, :len(seq)] = ROW_FOR[np.frombuffer(seq, dtype=np.uint8)]
+
+    # Count every (row, position) pair in one pass
+    cells = rows.astype(np.int64) * length + np.arange(length)
+    counts = np.bincount(cells.ravel(), minlength=(padding + 1) * length)
+
+    return counts.reshape(padding + 1, length)[:padding]
+
+
+def add_profiles(profile1, profile2):
+    """Add two profile arrays, extending the shorter if necessary"""
+
+    if profile1.shape[1] < profile2.shape[1]:
+        profile1, profile2 = profile2, profile1
+    profile1[:, :profile2.shape[1]] += profile2
+
+    return profile1
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Consensus and Profile')
@@ -48,6 +130,18 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A collection of at most 10 DNA strings of equal length '
         '(at most 1 kbp) in FASTA format')
+    parser.add_argument(
+        '--numpy', action='store_true',
+        help='Count with NumPy, streaming the input in chunks of records')
+    parser.add_argument(
+        '--chunk-size', metavar='RECORDS', type=int, default=10000,
+        help='Number of records per chunk with --numpy (default: 10000)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes counting chunks with --numpy (default: 1)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
+    if args.numpy and not import_numpy():
+        parser.error('--numpy requires NumPy')
 
-    main(args)
+    instrument.run(main, args)
@@ -6,22 +6,197 @@ that the symbols 'A', 'C', 'G', and 'T' occur in s".
 """
 
 import argparse
+from collections import Counter
+import io
+import mmap
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import read_chunks, split_headers  # noqa: E402
+
+# Bytes counted at a time within a chunk, so a whole chunk is never copied
+# (or widened to an array of counts' integers)
+BLOCK_SIZE = 1024 * 1024
+
+# NumPy, imported only for --stream (importing it takes longer than
+# solving most datasets)
+np = None
+
+# Memory map of input file in each worker process
+worker_map = None
 
 
 def main(args):
     """Counting DNA Nucleotides"""
 
-    s = args.dataset.read()
-
-    output = [s.count(base) for base in ['A', 'C', 'G', 'T']]
+    if args.stream:
+        counts = count_symbols(args.dataset, args.chunk_size, args.processes)
+        output = [counts[ord(base)] for base in ['A', 'C', 'G', 'T']]
+    elif args.packed:
+        # Imported only here, as it imports NumPy
+        from rosalind.packed import CHUNK_SIZE, PackedSeq
+        stream = getattr(args.dataset, 'buffer', args.dataset)
+        s = PackedSeq.from_chunks(instrument.iterate(
+            'parse', read_chunks(stream, CHUNK_SIZE)))
+        output = [s.count(base) for base in ['A', 'C', 'G', 'T']]
+    else:
+        s = instrument.read(args.dataset)
+        output = [s.count(base) for base in ['A', 'C', 'G', 'T']]
 
     print('{0[0]} {0[1]} {0[2]} {0[3]}'.format(output))
 
+    if args.stream and args.all_symbols:
+        for byte, count in enumerate(counts):
+            if count and byte not in b'ACGT' and not chr(byte).isspace():
+                print('{:s} {:d}'.format(chr(byte), count))
+
+
+def count_symbols(file, chunk_size, processes):
+    """Count every byte value in one pass over fixed-size chunks of a file"""
+
+    try:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (io.UnsupportedOperation, ValueError, OSError):
+        # Pipes and empty files can't be mapped, so just read sequentially
+        stream = getattr(file, 'buffer', file)
+        total = [0] * 256
+        in_header = False
+        for chunk in instrument.iterate('parse',
+                                        read_chunks(stream, chunk_size)):
+            counts, in_header = count_chunk(chunk, 0, len(chunk), in_header)
+            total = add_counts([total, counts])
+        return total
+
+    if processes == 1 or not is_named_file(file):
+        # Workers map the file by name, so can't share e.g. redirected stdin
+        return add_counts(count_chunk(mm, start, end, in_header)[0]
+                          for start, end, in_header
+                          in get_ranges(mm, chunk_size))
+
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(file.name,)) as pool:
+        return add_counts(pool.imap_unordered(count_range,
+                                              get_ranges(mm, chunk_size)))
+
+
+def is_named_file(file):
+    """Check whether an open file is the regular file at its name"""
+
+    try:
+        stat = os.fstat(file.fileno())
+        return os.path.isfile(file.name) and \
+            os.path.samestat(stat, os.stat(file.name))
+    except (AttributeError, TypeError, OSError):
+        return False
+
+
+def get_ranges(mm, chunk_size):
+    """Get (start, end, whether it starts inside a header line) of fixed-size
+    chunks"""
+
+    in_header = False
+    for start in range(0, len(mm), chunk_size):
+        end = min(start + chunk_size, len(mm))
+        yield start, end, in_header
+
+        # Chunk ends inside a header if its last line starts one (or it has
+        # no line ending and started inside one)
+        last = mm.rfind(b'\n', start, end)
+        if last != -1 or not in_header:
+            line_start = last + 1 if last != -1 else start
+            in_header = line_start < end and mm[line_start] == ord('>')
+
+
+def init_worker(path):
+    """Memory map input file in a worker process"""
+
+    global worker_map
+    with open(path, 'rb') as fh:
+        worker_map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def count_range(chunk_range):
+    """Count byte values in a range of the worker's memory map"""
+
+    start, end, in_header = chunk_range
+    return count_chunk(worker_map, start, end, in_header)[0]
+
+
+def count_chunk(data, start, end, in_header=False):
+    """Count byte values in a range of data a block at a time, ignoring any
+    FASTA headers, getting the counts and whether it ends inside a header
+    line"""
+
+    total = [0] * 256
+    for block_start in range(start, end, BLOCK_SIZE):
+        parts, in_header = split_headers(
+            data[block_start:min(block_start + BLOCK_SIZE, end)], in_header)
+        for is_header, part in parts:
+            if not is_header:
+                total = add_counts([total, count_block(part)])
+    return total, in_header
+
+
+def import_numpy():
+    """Import NumPy if available, getting whether it is"""
+
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def count_block(block):
+    """Count byte values in a block"""
+
+    if import_numpy():
+        return np.bincount(np.frombuffer(block, dtype=np.uint8),
+                           minlength=256).tolist()
+
+    counts = [0] * 256
+    for byte, count in Counter(bytearray(block)).items():
+        counts[byte] = count
+    return counts
+
+
+def add_counts(all_counts):
+    """Sum byte value counts from several chunks"""
+
+    total = [0] * 256
+    for counts in all_counts:
+        total = [count1 + count2 for count1, count2 in zip(total, counts)]
+    return total
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Counting DNA Nucleotides')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='File containing "A DNA string s of length at most 1000 nt')
+    parser.add_argument(
+        '--packed', action='store_true',
+        help='Hold sequence packed into 2 bits per base')
+    parser.add_argument(
+        '--stream', action='store_true',
+        help='Count in one pass over fixed-size chunks of the file '
+        '(also accepts FASTA, ignoring header lines)')
+    parser.add_argument(
+        '--chunk-size', metavar='BYTES', type=int, default=64 * 1024 * 1024,
+        help='Size of chunks with --stream (default: 64 MiB)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes counting chunks with --stream (default: 1)')
+    parser.add_argument(
+        '--all-symbols', action='store_true',
+        help='Also print counts of N and any other symbols with --stream')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
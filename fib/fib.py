@@ -7,25 +7,95 @@ litter of k rabbit pairs (instead of only 1 pair)".
 """
 
 import argparse
-from functools import lru_cache
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
 
 
 def main(args):
     """Rabbits and Recurrence Relations"""
 
-    (n, k) = [int(x) for x in args.dataset.read().split()]
+    # Results for large n have more digits than Python converts by default
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+
+    if args.batch:
+        queries = [tuple(int(x) for x in line.split())
+                   for line in instrument.iterate('parse', args.dataset)
+                   if line.strip()]
+        for total in fib_batch(queries, args.modulus):
+            print(total)
+        return
+
+    (n, k) = [int(x) for x in instrument.read(args.dataset).split()]
+
+    print(fib(n, k, args.modulus))
+
+
+def fib(n, k, modulus=None):
+    """Fibonacci function using powers of the recurrence matrix"""
+
+    return fib_batch([(n, k)], modulus)[0]
+
+
+def fib_batch(queries, modulus=None):
+    """Fibonacci function for many (n, k) queries, sharing powers of the
+    recurrence matrix between queries with the same k"""
 
-    print(fib(n, k))
+    totals = [None] * len(queries)
+    indices_for = {}
+    for i, (n, k) in enumerate(queries):
+        indices_for.setdefault(k, []).append(i)
 
+    for k, indices in indices_for.items():
+        max_n = max(queries[i][0] for i in indices)
+        squares = get_squares(k, max(max_n - 2, 0).bit_length(), modulus)
+        for i in indices:
+            n = queries[i][0]
+            totals[i] = apply_powers(squares, max(n - 2, 0), modulus)
 
-@lru_cache()
-def fib(n, k):
-    """Fibonacci recursive function"""
+    return totals
 
-    if n == 1 or n == 2:
-        return 1
 
-    return fib(n - 1, k) + fib(n - 2, k) * k
+def get_squares(k, count, modulus):
+    """Get M^1, M^2, M^4, ... of recurrence matrix M = [[1, k], [1, 0]]"""
+
+    squares = [((1, k), (1, 0))]
+    while len(squares) < count:
+        squares.append(multiply(squares[-1], squares[-1], modulus))
+    return squares
+
+
+def apply_powers(squares, power, modulus):
+    """Get first element of M^power applied to (F(2), F(1))"""
+
+    current, previous = 1, 1
+    bit = 0
+    while power:
+        if power & 1:
+            ((a, b), (c, d)) = squares[bit]
+            current, previous = a * current + b * previous, \
+                c * current + d * previous
+            if modulus:
+                current, previous = current % modulus, previous % modulus
+        power >>= 1
+        bit += 1
+    return current % modulus if modulus else current
+
+
+def multiply(x, y, modulus):
+    """Multiply 2x2 matrices"""
+
+    ((a, b), (c, d)) = x
+    ((e, f), (g, h)) = y
+    product = ((a * e + b * g, a * f + b * h), (c * e + d * g, c * f + d * h))
+    if modulus:
+        product = tuple(tuple(value % modulus for value in row)
+                        for row in product)
+    return product
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -33,6 +103,14 @@ if __name__ == '__main__':
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='Positive integers n≤40 and k≤5')
+    parser.add_argument(
+        '--batch', action='store_true',
+        help='Read a pair of integers n and k per line and print the total '
+        'for each')
+    parser.add_argument(
+        '--modulus', metavar='M', type=int,
+        help='Print totals modulo M')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -6,34 +6,127 @@ rabbits live for m months".
 """
 
 import argparse
-from functools import lru_cache
+from itertools import islice
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
 
 
 def main(args):
     """Mortal Fibonacci Rabbits"""
 
-    (n, m) = [int(x) for x in args.dataset.read().split()]
+    # Results for large n have more digits than Python converts by default
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+
+    (n, m) = [int(x) for x in instrument.read(args.dataset).split()]
 
-    print(sum(fib(n, m)))
+    if args.leslie:
+        print(fib_leslie(n, m, args.modulus))
+    else:
+        print(fib(n, m, args.modulus))
 
 
-@lru_cache()
-def fib(n, m):
-    """Fibonacci recursive function"""
+def fib(n, m, modulus=None):
+    """Fibonacci iterative function"""
 
     if n < 1:
-        return 0, 0
-    elif n == 1:
-        return 1, 0
-    elif n == 2:
-        return 0, 1
+        return 0
+    return next(islice(get_totals(m, modulus), n - 1, None))
+
+
+def get_totals(m, modulus=None):
+    """Get total pairs month by month, keeping a ring buffer of the number of
+    pairs of each age"""
+
+    ages = [0] * m
+    newest = 0  # Index of newborn pairs; the oldest are at the next index
+    ages[newest] = 1
+    total = 1
+    while True:
+        yield total
+        newborn = total - ages[newest]  # Pairs at least a month old breed
+        newest = (newest + 1) % m
+        total += newborn - ages[newest]  # Oldest pairs die
+        ages[newest] = newborn
+        if modulus:
+            total %= modulus
+            ages[newest] %= modulus
+
+
+def fib_leslie(n, m, modulus=None):
+    """Fibonacci function using powers of the Leslie matrix
+
+    By the Cayley-Hamilton theorem, the total for month n is a combination of
+    the totals for the first m months given by x^(n-1) modulo the matrix's
+    characteristic polynomial x^m - (x^(m-2) + ... + x + 1).
+    """
+
+    if n < 1:
+        return 0
+    initial = list(islice(get_totals(m, modulus), m))
+    if n <= m:
+        return initial[n - 1]
+
+    # Square and multiply to get x^(n-1)
+    power = [1]
+    base = reduce_polynomial([0, 1], m, modulus)
+    exponent = n - 1
+    while exponent:
+        if exponent & 1:
+            power = reduce_polynomial(multiply_polynomials(power, base), m,
+                                      modulus)
+        exponent >>= 1
+        if exponent:
+            base = reduce_polynomial(multiply_polynomials(base, base), m,
+                                     modulus)
 
-    young_prev, mature_prev = fib(n - 1, m)
-    young_prev_m, mature_prev_m = fib(n - m, m)
-    young = mature_prev
-    mature = mature_prev + young_prev - young_prev_m
+    total = sum(coeff * value for coeff, value in zip(power, initial))
+    return total % modulus if modulus else total
 
-    return young, mature
+
+def multiply_polynomials(poly1, poly2):
+    """Multiply polynomials with non-negative coefficients by packing each
+    into a single integer (Kronecker substitution)"""
+
+    if not poly1 or not poly2:
+        return []
+    bits = max(max(poly1).bit_length() + max(poly2).bit_length() +
+               min(len(poly1), len(poly2)).bit_length(), 1)
+    width = (bits + 7) // 8
+
+    def pack(poly):
+        return int.from_bytes(b''.join(coeff.to_bytes(width, 'little')
+                                       for coeff in poly), 'little')
+
+    product = (pack(poly1) * pack(poly2)).to_bytes(
+        (len(poly1) + len(poly2) - 1) * width, 'little')
+    return [int.from_bytes(product[i:i + width], 'little')
+            for i in range(0, len(product), width)]
+
+
+def reduce_polynomial(poly, m, modulus):
+    """Reduce polynomial modulo x^m - (x^(m-2) + ... + x + 1)
+
+    Each x^d with d >= m becomes x^(d-2) + ... + x^(d-m), so working down from
+    the highest degree, each coefficient gains a sliding window sum of the
+    (already reduced) coefficients 2 to m degrees above it.
+    """
+
+    poly = poly + [0] * (m - len(poly))
+    window = 0
+    for degree in range(len(poly) - 1, -1, -1):
+        if m <= degree + 2 < len(poly):
+            window += poly[degree + 2]
+        if m <= degree + m + 1 < len(poly):
+            window -= poly[degree + m + 1]
+        poly[degree] += window
+        if modulus:
+            poly[degree] %= modulus
+    return poly[:m]
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -41,6 +134,13 @@ if __name__ == '__main__':
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='Positive integers n≤100 and m≤20')
+    parser.add_argument(
+        '--leslie', action='store_true',
+        help='Use powers of the Leslie matrix (faster for very large n)')
+    parser.add_argument(
+        '--modulus', metavar='M', type=int,
+        help='Print total modulo M')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -5,33 +5,93 @@ most 1 kbp each)" and returns "The ID of the string having the highest
 GC-content, followed by the GC-content of that string".
 """
 
+from __future__ import division
 import argparse
+from functools import partial
+from itertools import accumulate
+import os
+import sys
 from Bio import SeqIO
 from Bio.Alphabet import generic_dna
 from Bio.SeqUtils import GC
 
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import open_text  # noqa: E402
+from rosalind.parallel import imap  # noqa: E402
+
+# Number of records sent to a worker process at a time
+CHUNKSIZE = 1000
+
+# Bases counted by Bio.SeqUtils.GC
+GC_BASES = 'CGScgs'
+
 
 def main(args):
     """Computing GC Content"""
 
+    dataset = open_text(args.dataset)
+    records = ((record.id, record.seq)
+               for record in instrument.iterate(
+                   'parse', SeqIO.parse(dataset, 'fasta', generic_dna)))
+
+    if args.window:
+        get_track = partial(get_gc_track, window=args.window,
+                            step=args.step or args.window)
+        for id, track in imap(get_track, records, args.processes, CHUNKSIZE):
+            for start, gc in track:
+                print('{:s}\t{:d}\t{:d}\t{:.3f}'.format(
+                    id, start, start + args.window, gc))
+        return
+
     high_id = None
     high_gc = 0
 
-    for record in SeqIO.parse(args.dataset, 'fasta', generic_dna):
-        gc = GC(record.seq)
+    for id, gc in imap(get_gc, records, args.processes, CHUNKSIZE):
         if gc > high_gc:
-            high_id = record.id
+            high_id = id
             high_gc = gc
 
     print(high_id)
     print('{:.3f}'.format(high_gc))
 
+
+def get_gc(record):
+    """Get GC content of a record"""
+
+    id, seq = record
+    return id, GC(seq)
+
+
+def get_gc_track(record, window, step):
+    """Get GC content of each window of a record, using prefix sums so the
+    cost doesn't depend on window size"""
+
+    id, seq = record
+    gc_before = [0]
+    gc_before.extend(accumulate(base in GC_BASES for base in str(seq)))
+    return id, [(start,
+                 (gc_before[start + window] - gc_before[start]) * 100 / window)
+                for start in range(0, len(seq) - window + 1, step)]
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Computing GC Content')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='At most 10 DNA strings in FASTA format '
         '(of length at most 1 kbp each)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes computing GC content (default: 1)')
+    parser.add_argument(
+        '--window', metavar='SIZE', type=int,
+        help='Print GC content of every full window of this size in each '
+        'record (as ID, start, end and GC content) instead')
+    parser.add_argument(
+        '--step', metavar='SIZE', type=int,
+        help='Distance between starts of windows (default: window size)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
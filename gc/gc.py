@@ -7,16 +7,44 @@ GC-content, followed by the GC-content of that string".
 
 from __future__ import division
 import argparse
+from functools import partial
+from itertools import accumulate
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import read_fasta  # noqa: E402
+from rosalind.parallel import imap  # noqa: E402
+
+# Number of records sent to a worker process at a time
+CHUNKSIZE = 1000
+
+# NumPy and its table of whether each byte is G or C, imported only for
+# --window (importing NumPy takes longer than solving most datasets)
+np = None
+IS_GC = None
 
 
 def main(args):
     """Computing GC Content"""
 
+    records = instrument.iterate('parse', read_fasta(args.dataset))
+
+    if args.window:
+        get_track = partial(get_gc_track, window=args.window,
+                            step=args.step or args.window)
+        for id, track in imap(get_track, records, args.processes, CHUNKSIZE):
+            for start, gc in track:
+                print('{:s}\t{:d}\t{:d}\t{:.3f}'.format(
+                    id, start, start + args.window, gc * 100))
+        return
+
     high_id = None
     high_gc = 0
 
-    for id, seq in read_fasta(args.dataset):
-        gc = (seq.count('C') + seq.count('G')) / len(seq)
+    for id, gc in imap(get_gc, records, args.processes, CHUNKSIZE):
         if gc > high_gc:
             high_id = id
             high_gc = gc
@@ -25,22 +53,45 @@ def main(args):
     print('{:.3f}'.format(high_gc * 100))
 
 
-def read_fasta(file):
-    """Read FASTA file record by record"""
+def get_gc(record):
+    """Get GC content of a record"""
+
+    id, seq = record
+    return id, (seq.count('C') + seq.count('G')) / len(seq)
+
+
+def import_numpy():
+    """Import NumPy if available, getting whether it is"""
 
-    id = None
-    seq = []
-    for line in file:
-        line = line.rstrip()
-        if line.startswith('>'):
-            if id:
-                yield(id, ''.join(seq))
-            id = line.lstrip('>')
-            seq = []
-        else:
-            seq.append(line)
-    if id:
-        yield(id, ''.join(seq))
+    global np, IS_GC
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+        IS_GC = np.zeros(256, dtype=np.int64)
+        IS_GC[[ord('C'), ord('G')]] = 1
+    return True
+
+
+def get_gc_track(record, window, step):
+    """Get GC content of each window of a record, using prefix sums so the
+    cost doesn't depend on window size"""
+
+    id, seq = record
+    if import_numpy():
+        is_gc = IS_GC[np.frombuffer(seq.encode('ascii'), dtype=np.uint8)]
+        gc_before = np.concatenate(([0], np.cumsum(is_gc)))
+        starts = np.arange(0, len(seq) - window + 1, step)
+        gcs = (gc_before[starts + window] - gc_before[starts]) / window
+        return id, list(zip(starts.tolist(), gcs.tolist()))
+
+    gc_before = [0]
+    gc_before.extend(accumulate(base in 'CG' for base in seq))
+    return id, [(start,
+                 (gc_before[start + window] - gc_before[start]) / window)
+                for start in range(0, len(seq) - window + 1, step)]
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Computing GC Content')
@@ -48,6 +99,17 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='At most 10 DNA strings in FASTA format '
         '(of length at most 1 kbp each)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes computing GC content (default: 1)')
+    parser.add_argument(
+        '--window', metavar='SIZE', type=int,
+        help='Print GC content of every full window of this size in each '
+        'record (as ID, start, end and GC content) instead')
+    parser.add_argument(
+        '--step', metavar='SIZE', type=int,
+        help='Distance between starts of windows (default: window size)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -6,42 +6,49 @@ O3. You may return edges in any order".
 """
 
 import argparse
+from collections import defaultdict
+import os
+import sys
 from Bio import SeqIO
 from Bio.Alphabet import generic_dna
 
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import open_text  # noqa: E402
+
 
 def main(args):
     """Overlap Graphs"""
 
-    # Overlap constant
-    OVERLAP = 3
-
-    seq_by_prefix = {}
-    for record in SeqIO.parse(args.dataset, 'fasta', generic_dna):
-        try:
-            seq_by_prefix[str(record.seq[:OVERLAP])].append(record.id)
-        except KeyError:
-            seq_by_prefix[str(record.seq[:OVERLAP])] = [record.id]
-
-    graph = {}
-    args.dataset.seek(0)
-    for record in SeqIO.parse(args.dataset, 'fasta', generic_dna):
-        suffix = str(record.seq[-OVERLAP:])
-        try:
-            for overlap_id in seq_by_prefix[suffix]:
-                if record.id == overlap_id:
-                    continue
-                try:
-                    graph[record.id][overlap_id] = True
-                except KeyError:
-                    graph[record.id] = {}
-                    graph[record.id][overlap_id] = True
-        except:
-            pass
-
-    for id1 in graph:
-        for id2 in graph[id1]:
-            print('{:s} {:s}'.format(id1, id2))
+    dataset = open_text(args.dataset)
+    records = ((record.id, str(record.seq))
+               for record in instrument.iterate(
+                   'parse', SeqIO.parse(dataset, 'fasta', generic_dna)))
+    for id1, id2 in get_overlaps(records, args.overlap):
+        print('{:s} {:s}'.format(id1, id2))
+
+
+def get_overlaps(records, overlap):
+    """Get pairs of overlapping records in a single pass"""
+
+    # Each new record is checked against the prefixes and suffixes of all the
+    # records before it, so every edge is found exactly once
+    ids_by_prefix = defaultdict(list)
+    ids_by_suffix = defaultdict(list)
+    for id, seq in records:
+        if len(seq) < overlap:
+            continue
+        prefix = seq[:overlap]
+        suffix = seq[-overlap:]
+        for overlap_id in ids_by_prefix.get(suffix, ()):
+            if overlap_id != id:
+                yield id, overlap_id
+        for overlap_id in ids_by_suffix.get(prefix, ()):
+            if overlap_id != id:
+                yield overlap_id, id
+        ids_by_prefix[prefix].append(id)
+        ids_by_suffix[suffix].append(id)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Overlap Graphs')
@@ -49,6 +56,13 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A collection of DNA strings in FASTA format '
         'having total length at most 10 kbp')
+    parser.add_argument(
+        '--overlap', metavar='K', type=int, default=3,
+        help='Length of suffix/prefix overlap defining an edge (default: 3)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    if args.overlap < 1:
+        parser.error('--overlap must be at least 1')
+
+    instrument.run(main, args)
@@ -5,59 +5,401 @@ total length at most 10 kbp" and returns "The adjacency list corresponding to
 O3. You may return edges in any order".
 """
 
+from array import array
 import argparse
+from collections import defaultdict
+from functools import partial
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument, output  # noqa: E402
+from rosalind.fasta import read_fasta  # noqa: E402
+from rosalind.parallel import imap  # noqa: E402
+
+# Approximate bytes of memory used joining a shard per byte of its file of
+# prefixes (which are held in a dict while its suffixes are streamed)
+SHARD_EXPANSION = 8
+
+# Times an oversized shard is split again before joining it a block at a
+# time (e.g. if most records share one prefix)
+MAX_SPLITS = 3
 
 
 def main(args):
     """Overlap Graphs"""
 
-    # Overlap constant
-    OVERLAP = 3
-
-    seq_by_prefix = {}
-    for id, seq in read_fasta(args.dataset):
-        try:
-            seq_by_prefix[seq[:OVERLAP]].append(id)
-        except KeyError:
-            seq_by_prefix[seq[:OVERLAP]] = [id]
-
-    graph = {}
-    args.dataset.seek(0)
-    for id, seq in read_fasta(args.dataset):
-        suffix = seq[-OVERLAP:]
+    records = instrument.iterate('parse', read_fasta(args.dataset))
+    if args.shards:
+        directory = tempfile.mkdtemp(prefix='grph-', dir=args.tmp_dir)
         try:
-            for overlap_id in seq_by_prefix[suffix]:
-                if id == overlap_id:
+            edges = get_overlaps_sharded(
+                records, args.overlap, directory, args.shards,
+                args.memory * 2 ** 20, args.processes)
+            with output.Writer(args.output, args.format,
+                               columns=2) as writer:
+                if args.format == 'npy':
+                    writer.write_rows(edge[:2] for edge in edges)
+                else:
+                    writer.write_rows(edge[2:] for edge in edges)
+        finally:
+            shutil.rmtree(directory)
+        return
+
+    if not (args.reduce or args.degrees or args.gfa):
+        if args.format == 'npy':
+            # Edges as pairs of (0-based) record numbers rather than IDs
+            records = ((i, seq) for i, (_, seq) in enumerate(records))
+        with output.Writer(args.output, args.format, columns=2) as writer:
+            writer.write_rows(get_overlaps(records, args.overlap))
+        return
+
+    graph = OverlapGraph.from_records(records, args.overlap)
+    if args.reduce:
+        graph = graph.transitive_reduction()
+    if args.gfa:
+        with output.Writer(args.output, 'tsv') as writer:
+            writer.write_rows(graph.get_gfa())
+    elif args.degrees:
+        with output.Writer(args.output, args.format, columns=2) as writer:
+            if args.format == 'npy':
+                writer.write_rows(graph.degrees())
+            else:
+                writer.write_rows((id, in_degree, out_degree)
+                                  for id, (in_degree, out_degree)
+                                  in zip(graph.ids, graph.degrees()))
+    else:
+        with output.Writer(args.output, args.format, columns=2) as writer:
+            if args.format == 'npy':
+                writer.write_rows(graph.edges())
+            else:
+                ids = graph.ids
+                writer.write_rows((ids[source], ids[target])
+                                  for source, target in graph.edges())
+
+
+def get_overlaps(records, overlap):
+    """Get pairs of overlapping records in a single pass"""
+
+    # Each new record is checked against the prefixes and suffixes of all the
+    # records before it, so every edge is found exactly once
+    ids_by_prefix = defaultdict(list)
+    ids_by_suffix = defaultdict(list)
+    for id, seq in records:
+        if len(seq) < overlap:
+            continue
+        prefix = seq[:overlap]
+        suffix = seq[-overlap:]
+        for overlap_id in ids_by_prefix.get(suffix, ()):
+            if overlap_id != id:
+                yield id, overlap_id
+        for overlap_id in ids_by_suffix.get(prefix, ()):
+            if overlap_id != id:
+                yield overlap_id, id
+        ids_by_prefix[prefix].append(id)
+        ids_by_suffix[suffix].append(id)
+
+
+def get_overlaps_sharded(records, overlap, directory, shards, memory,
+                         processes=1):
+    """Get (source number, target number, source ID, target ID) of
+    overlapping records out of core
+
+    Prefixes and suffixes of records are written to shard files (in a
+    directory) by hash, then each shard is joined on its own, in parallel if
+    more than one process, keeping the memory each process uses for a shard
+    under a limit.
+    """
+
+    write_shards(records, overlap, directory, shards, memory)
+    join = partial(join_shard_file, directory=directory, shards=shards,
+                   memory=memory // processes)
+    for path in imap(join, [str(i) for i in range(shards)], processes,
+                     ordered=False):
+        with open(path) as fh:
+            for line in fh:
+                number, overlap_number, id, overlap_id = \
+                    line.rstrip('\n').split('\t')
+                yield int(number), int(overlap_number), id, overlap_id
+        os.remove(path)
+
+
+def get_shard_path(directory, name, side):
+    """Get path of a shard's file of prefixes, suffixes or edges"""
+
+    return os.path.join(directory, '{:s}.{:s}'.format(name, side))
+
+
+def get_shard(kmer, shards, splits=0):
+    """Get shard of a k-mer (with a different hash each time a shard is
+    split)"""
+
+    return zlib.crc32(kmer.encode('ascii'), splits) % shards
+
+
+class ShardWriter(object):
+    """Writer of prefix and suffix lines to shard files
+
+    Lines are held in memory up to a limit and then appended to their files
+    one file at a time, so however many shards there are, only one file is
+    open and memory stays under the limit.
+    """
+
+    def __init__(self, directory, names, memory):
+        self.paths = [[get_shard_path(directory, name, side)
+                       for side in ('prefixes', 'suffixes')]
+                      for name in names]
+        self.lines = [[[], []] for _ in names]
+        self.size = 0
+        self.limit = max(1, memory // SHARD_EXPANSION)
+
+    def write(self, shard, side, line):
+        """Write line to prefixes (side 0) or suffixes (side 1) of a shard"""
+
+        self.lines[shard][side].append(line)
+        self.size += len(line)
+        if self.size >= self.limit:
+            self.flush()
+
+    def flush(self):
+        """Append lines held to their files"""
+
+        for paths, lines in zip(self.paths, self.lines):
+            for path, side_lines in zip(paths, lines):
+                if side_lines:
+                    with open(path, 'a') as fh:
+                        fh.write(''.join(side_lines))
+                    del side_lines[:]
+        self.size = 0
+
+
+def write_shards(records, overlap, directory, shards, memory):
+    """Write (k-mer, record number, ID) of the prefix and suffix of each
+    record to shard files"""
+
+    writer = ShardWriter(directory, [str(i) for i in range(shards)], memory)
+    for number, (id, seq) in enumerate(records):
+        if len(seq) < overlap:
+            continue
+        prefix = seq[:overlap]
+        suffix = seq[-overlap:]
+        writer.write(get_shard(prefix, shards), 0,
+                     '{:s}\t{:d}\t{:s}\n'.format(prefix, number, id))
+        writer.write(get_shard(suffix, shards), 1,
+                     '{:s}\t{:d}\t{:s}\n'.format(suffix, number, id))
+    writer.flush()
+
+
+def split_shard(directory, name, shards, memory, splits):
+    """Split a shard's files into more shards, getting their names"""
+
+    names = ['{:s}-{:d}'.format(name, i) for i in range(shards)]
+    writer = ShardWriter(directory, names, memory)
+    for side in (0, 1):
+        path = get_shard_path(directory, name, ('prefixes', 'suffixes')[side])
+        if not os.path.exists(path):
+            continue
+        with open(path) as fh:
+            for line in fh:
+                kmer = line[:line.index('\t')]
+                writer.write(get_shard(kmer, shards, splits), side, line)
+        os.remove(path)
+    writer.flush()
+    return names
+
+
+def join_shard(directory, name, shards, memory, splits=0):
+    """Get overlapping records in a shard, splitting it first if joining it
+    in memory would use more than the limit
+
+    If it's still too large after splitting it a few times (e.g. because
+    most records share a k-mer), it's joined a block of prefixes at a time,
+    reading all of its suffixes for each block.
+    """
+
+    prefixes = get_shard_path(directory, name, 'prefixes')
+    suffixes = get_shard_path(directory, name, 'suffixes')
+    if not (os.path.exists(prefixes) and os.path.exists(suffixes)):
+        # No edges without both prefixes and suffixes
+        for path in (prefixes, suffixes):
+            if os.path.exists(path):
+                os.remove(path)
+        return
+    if os.path.getsize(prefixes) * SHARD_EXPANSION > memory and \
+            splits < MAX_SPLITS:
+        for sub_name in split_shard(directory, name, shards, memory,
+                                    splits + 1):
+            for edge in join_shard(directory, sub_name, shards, memory,
+                                   splits + 1):
+                yield edge
+        return
+
+    block_size = max(1, memory // SHARD_EXPANSION)
+    with open(prefixes) as prefix_fh:
+        while True:
+            records_by_prefix = defaultdict(list)
+            size = 0
+            for line in prefix_fh:
+                prefix, number, id = line.rstrip('\n').split('\t', 2)
+                records_by_prefix[prefix].append((number, id))
+                size += len(line)
+                if size >= block_size:
+                    break
+            if not records_by_prefix:
+                break
+
+            with open(suffixes) as fh:
+                for line in fh:
+                    suffix, number, id = line.rstrip('\n').split('\t', 2)
+                    for overlap_number, overlap_id in \
+                            records_by_prefix.get(suffix, ()):
+                        if overlap_number != number:
+                            yield number, overlap_number, id, overlap_id
+    os.remove(prefixes)
+    os.remove(suffixes)
+
+
+def join_shard_file(name, directory, shards, memory):
+    """Join a shard, writing its edges to a file and getting its path"""
+
+    path = get_shard_path(directory, name, 'edges')
+    with open(path, 'w') as fh:
+        for edge in join_shard(directory, name, shards, memory):
+            fh.write('\t'.join(edge) + '\n')
+    return path
+
+
+class OverlapGraph(object):
+    """Overlap graph with record IDs interned as numbers and edges held in
+    CSR arrays: the targets of record i's edges (in order) are
+    targets[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, ids, edges, lengths=None, overlap=None):
+        # Edges are read before counting records, so ids can be filled in as
+        # edges are found
+        sources = array('i')
+        targets = array('i')
+        for source, target in edges:
+            sources.append(source)
+            targets.append(target)
+        self.ids = ids
+        self.lengths = lengths
+        self.overlap = overlap
+
+        # Counting sort of edges by source
+        self.offsets = array('q', [0]) * (len(ids) + 1)
+        self.in_degrees = array('q', [0]) * len(ids)
+        for source in sources:
+            self.offsets[source + 1] += 1
+        for target in targets:
+            self.in_degrees[target] += 1
+        for i in range(len(ids)):
+            self.offsets[i + 1] += self.offsets[i]
+        ends = self.offsets[:-1]
+        self.targets = array('i', [0]) * len(targets)
+        for source, target in zip(sources, targets):
+            self.targets[ends[source]] = target
+            ends[source] += 1
+        del sources, targets
+
+        for i in range(len(ids)):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            if end - start > 1:
+                self.targets[start:end] = array(
+                    'i', sorted(self.targets[start:end]))
+
+    @classmethod
+    def from_records(cls, records, overlap):
+        """Get overlap graph of (ID, sequence) records"""
+
+        ids = []
+        lengths = array('q')
+
+        def numbered():
+            for id, seq in records:
+                ids.append(id)
+                lengths.append(len(seq))
+                yield len(ids) - 1, seq
+
+        return cls(ids, get_overlaps(numbered(), overlap), lengths, overlap)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def out_degree(self, i):
+        """Get number of edges from record i"""
+
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def in_degree(self, i):
+        """Get number of edges to record i"""
+
+        return self.in_degrees[i]
+
+    def degrees(self):
+        """Get (in-degree, out-degree) of each record"""
+
+        for i in range(len(self.ids)):
+            yield self.in_degrees[i], self.offsets[i + 1] - self.offsets[i]
+
+    def successors(self, i):
+        """Get (sorted) targets of edges from record i"""
+
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def edges(self):
+        """Get (source, target) of every edge, ordered by source"""
+
+        targets = self.targets
+        for source in range(len(self.ids)):
+            for j in range(self.offsets[source], self.offsets[source + 1]):
+                yield source, targets[j]
+
+    def transitive_reduction(self):
+        """Get graph without transitive edges
+
+        Myers-style: an edge u -> w is dropped if u -> v -> w for some v whose
+        own edge from u is kept (taking v in order), so a pair of records
+        reachable from each other can't remove both edges from u.
+        """
+
+        reduced = []
+        for source in range(len(self.ids)):
+            successors = self.successors(source)
+            if len(successors) < 2:
+                continue
+            reachable = set(successors)
+            removed = set()
+            for middle in successors:
+                if middle in removed:
                     continue
-                try:
-                    graph[id][overlap_id] = True
-                except KeyError:
-                    graph[id] = {}
-                    graph[id][overlap_id] = True
-        except:
-            pass
-
-    for id1 in graph:
-        for id2 in graph[id1]:
-            print('{:s} {:s}'.format(id1, id2))
-
-
-def read_fasta(file):
-    """Read FASTA file record by record"""
-
-    id = None
-    seq = []
-    for line in file:
-        line = line.rstrip()
-        if line.startswith('>'):
-            if id:
-                yield(id, ''.join(seq))
-            id = line.lstrip('>')
-            seq = []
-        else:
-            seq.append(line)
-    if id:
-        yield(id, ''.join(seq))
+                for target in self.successors(middle):
+                    if target in reachable and target != middle:
+                        removed.add(target)
+            reduced.extend((source, target) for target in removed)
+
+        reduced = set(reduced)
+        return OverlapGraph(
+            self.ids, (edge for edge in self.edges() if edge not in reduced),
+            self.lengths, self.overlap)
+
+    def get_gfa(self):
+        """Get GFA 1.0 lines (as tuples of fields) with a segment per record
+        and a link per edge"""
+
+        yield 'H', 'VN:Z:1.0'
+        for i, id in enumerate(self.ids):
+            if self.lengths is None:
+                yield 'S', id, '*'
+            else:
+                yield 'S', id, '*', 'LN:i:{:d}'.format(self.lengths[i])
+        cigar = '*' if self.overlap is None else '{:d}M'.format(self.overlap)
+        for source, target in self.edges():
+            yield 'L', self.ids[source], '+', self.ids[target], '+', cigar
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Overlap Graphs')
@@ -65,6 +407,45 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A collection of DNA strings in FASTA format '
         'having total length at most 10 kbp')
+    parser.add_argument(
+        '--overlap', metavar='K', type=int, default=3,
+        help='Length of suffix/prefix overlap defining an edge (default: 3)')
+    parser.add_argument(
+        '--reduce', action='store_true',
+        help='Remove transitive edges (u -> w where u -> v -> w)')
+    parser.add_argument(
+        '--degrees', action='store_true',
+        help='Print ID, in-degree and out-degree of each record instead of '
+        'edges')
+    parser.add_argument(
+        '--gfa', action='store_true',
+        help='Print graph in GFA 1.0 format instead of edges')
+    parser.add_argument(
+        '--shards', metavar='N', type=int,
+        help='Find edges out of core, via N shard files of prefixes and '
+        'suffixes joined one at a time')
+    parser.add_argument(
+        '--memory', metavar='MB', type=int, default=256,
+        help='Memory for joining shards with --shards, shards being split '
+        'further to fit (default: 256)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes joining shards with --shards (default: 1)')
+    parser.add_argument(
+        '--tmp-dir', metavar='DIR',
+        help='Directory for shard files (default: system temporary '
+        'directory)')
+    output.add_arguments(
+        parser, 'pairs of record numbers (or of degrees with --degrees)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    if args.overlap < 1:
+        parser.error('--overlap must be at least 1')
+    if args.gfa and args.format != 'text':
+        parser.error('--gfa cannot be combined with --format')
+    if args.shards and (args.reduce or args.degrees or args.gfa):
+        parser.error('--shards cannot be combined with --reduce, --degrees '
+                     'or --gfa')
+
+    instrument.run(main, args)
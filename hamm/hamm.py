@@ -5,20 +5,236 @@
 """
 
 import argparse
+from functools import partial
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import read_fasta_lines  # noqa: E402
+from rosalind.parallel import imap  # noqa: E402
+
+# NumPy and its table of bits set in each byte, imported only for --batch
+# (importing NumPy takes longer than solving most datasets)
+np = None
+POPCOUNT = None
+
+# Bit-planes of all sequences in each worker process
+worker_planes = None
 
 
 def main(args):
     """Counting Point Mutations"""
 
-    (s, t) = [line.rstrip() for line in args.dataset]
+    if not args.batch:
+        (s, t) = [line.rstrip()
+                  for line in instrument.iterate('parse', args.dataset)]
+
+        if args.packed:
+            # Imported only here, as it imports NumPy
+            from rosalind.packed import PackedSeq
+            print(PackedSeq(s).hamming(PackedSeq(t)))
+            return
+
+        print(len([True for x, y in zip(s, t) if x != y]))
+        return
+
+    ids, seqs = read_sequences(args.dataset)
+    if len(set(len(seq) for seq in seqs)) > 1:
+        sys.exit('Sequences must all be the same length')
+
+    if args.max_distance is None:
+        if not import_numpy():
+            rows = get_distance_rows_pure(seqs)
+        else:
+            rows = get_distance_rows(seqs, args.tile_size, args.processes)
+        for row in rows:
+            print(' '.join(str(distance) for distance in row))
+    else:
+        if not import_numpy():
+            pairs = get_close_pairs_pure(seqs, args.max_distance)
+        else:
+            pairs = get_close_pairs(seqs, args.max_distance, args.tile_size,
+                                    args.processes)
+        for i, j, distance in pairs:
+            print('{:s} {:s} {:d}'.format(ids[i], ids[j], distance))
+
+
+def import_numpy():
+    """Import NumPy if available, getting whether it is"""
+
+    global np, POPCOUNT
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+        POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)],
+                            dtype=np.uint8)
+    return True
+
+
+def read_sequences(file):
+    """Read sequences, either one per line or in FASTA format"""
+
+    lines = [line for line in instrument.iterate('parse', file)
+             if line.strip()]
+    if lines and lines[0].startswith('>'):
+        records = list(read_fasta_lines(lines))
+        return ([id for id, _ in records], [seq for _, seq in records])
+
+    seqs = [line.rstrip().encode('ascii') for line in lines]
+    return [str(i) for i in range(1, len(seqs) + 1)], seqs
+
+
+def get_bit_planes(seqs):
+    """Encode sequences as (planes x sequences x bytes) array of packed bits,
+    with as many planes as needed to give each symbol its own code"""
+
+    symbols = sorted(set(b''.join(seqs)))
+    code_for = np.zeros(256, dtype=np.uint8)
+    code_for[symbols] = np.arange(len(symbols))
+    codes = code_for[np.frombuffer(b''.join(seqs), dtype=np.uint8)]
+    codes = codes.reshape(len(seqs), -1)
+
+    num_planes = max(1, (len(symbols) - 1).bit_length())
+    return np.stack([np.packbits((codes >> plane) & 1, axis=1)
+                     for plane in range(num_planes)])
+
+
+def init_worker(planes):
+    """Store bit-planes in a worker process"""
+
+    global worker_planes
+    import_numpy()  # In case it wasn't inherited
+    worker_planes = planes
+
+
+def get_distance_block(rows, tile_size, max_distance):
+    """Get distances from a block of rows to all sequences, XORing bit-planes
+    one tile of columns at a time
+
+    If max_distance is given then only (i, j, distance) of later sequences
+    within that distance are returned.
+    """
+
+    start, end = rows
+    planes = worker_planes
+    first_column = 0 if max_distance is None else start
+    distances = []
+    for tile_start in range(first_column, planes.shape[1], tile_size):
+        tile_end = min(tile_start + tile_size, planes.shape[1])
+        diff = np.zeros((end - start, tile_end - tile_start, planes.shape[2]),
+                        dtype=np.uint8)
+        for plane in planes:
+            diff |= plane[start:end, None] ^ plane[None, tile_start:tile_end]
+        distances.append(POPCOUNT[diff].sum(axis=2, dtype=np.int32))
+    distances = np.concatenate(distances, axis=1)
+
+    if max_distance is None:
+        return distances.tolist()
 
-    print(len([True for x, y in zip(s, t) if x != y]))
+    i, j = np.nonzero(np.triu(distances <= max_distance, 1))
+    return list(zip((i + start).tolist(), (j + start).tolist(),
+                    distances[i, j].tolist()))
+
+
+def get_distance_blocks(seqs, tile_size, processes, max_distance):
+    """Get results of get_distance_block for each block of rows in order"""
+
+    planes = get_bit_planes(seqs)
+    blocks = ((start, min(start + tile_size, len(seqs)))
+              for start in range(0, len(seqs), tile_size))
+    get_block = partial(get_distance_block, tile_size=tile_size,
+                        max_distance=max_distance)
+    return imap(get_block, blocks, processes, initializer=init_worker,
+                initargs=(planes,))
+
+
+def get_distance_rows(seqs, tile_size, processes):
+    """Get distances to all sequences row by row"""
+
+    for rows in get_distance_blocks(seqs, tile_size, processes, None):
+        for row in rows:
+            yield row
+
+
+def get_close_pairs(seqs, max_distance, tile_size, processes):
+    """Get (i, j, distance) of all pairs within max_distance"""
+
+    for pairs in get_distance_blocks(seqs, tile_size, processes,
+                                     max_distance):
+        for pair in pairs:
+            yield pair
+
+
+def get_int_planes(seqs):
+    """Encode sequences as lists of integers used as bit-planes"""
+
+    symbols = sorted(set(b''.join(seqs)))
+    num_planes = max(1, (len(symbols) - 1).bit_length())
+    all_planes = []
+    for seq in seqs:
+        codes = [symbols.index(symbol) for symbol in bytearray(seq)]
+        all_planes.append([int(''.join(str(code >> plane & 1)
+                                       for code in codes) or '0', 2)
+                           for plane in range(num_planes)])
+    return all_planes
+
+
+def get_int_distance(planes1, planes2):
+    """Get distance between two sequences encoded as integer bit-planes"""
+
+    diff = 0
+    for plane1, plane2 in zip(planes1, planes2):
+        diff |= plane1 ^ plane2
+    return bin(diff).count('1')
+
+
+def get_distance_rows_pure(seqs):
+    """Get distances to all sequences row by row (without NumPy)"""
+
+    all_planes = get_int_planes(seqs)
+    for planes1 in all_planes:
+        yield [get_int_distance(planes1, planes2) for planes2 in all_planes]
+
+
+def get_close_pairs_pure(seqs, max_distance):
+    """Get (i, j, distance) of all pairs within max_distance (without
+    NumPy)"""
+
+    all_planes = get_int_planes(seqs)
+    for i, planes1 in enumerate(all_planes):
+        for j in range(i + 1, len(all_planes)):
+            distance = get_int_distance(planes1, all_planes[j])
+            if distance <= max_distance:
+                yield i, j, distance
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Counting Point Mutations')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='Two DNA strings s and t of equal length (not exceeding 1 kbp)')
+    parser.add_argument(
+        '--packed', action='store_true',
+        help='Hold sequences packed into 2 bits per base')
+    parser.add_argument(
+        '--batch', action='store_true',
+        help='Print matrix of distances between all pairs of any number of '
+        'sequences (one per line or in FASTA format)')
+    parser.add_argument(
+        '--max-distance', metavar='D', type=int,
+        help='With --batch, print pairs (and distance) within distance D '
+        'instead of a matrix')
+    parser.add_argument(
+        '--tile-size', metavar='N', type=int, default=256,
+        help='Number of sequences per tile with --batch (default: 256)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes computing tiles with --batch (default: 1)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -10,18 +10,75 @@ phenotype)".
 
 from __future__ import division
 import argparse
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+
+# Genotype constants
+HOM_DOM = 0
+HET = 1
+HOM_REC = 2
+GENOTYPES = (HOM_DOM, HET, HOM_REC)
+
+# Transition probabilities computed at a time with --generations, bounding
+# the memory used whatever the size of the population
+TRANSITIONS_BLOCK = 1024 * 1024
+
+# NumPy, imported only for --batch and --generations (importing it takes
+# longer than solving a single population)
+np = None
+
+# Probabilities of each offspring genotype for each pair of parent genotypes
+OFFSPRING = (((1, 0, 0), (1 / 2, 1 / 2, 0), (0, 1, 0)),
+             ((1 / 2, 1 / 2, 0), (1 / 4, 1 / 2, 1 / 4), (0, 1 / 2, 1 / 2)),
+             ((0, 1, 0), (0, 1 / 2, 1 / 2), (0, 0, 1)))
 
 
 def main(args):
     """Mendel's First Law"""
 
-    (k, m, n) = [int(x) for x in args.dataset.read().split()]
+    if args.batch:
+        populations = [tuple(int(x) for x in line.split())
+                       for line in instrument.iterate('parse', args.dataset)
+                       if line.strip()]
+    else:
+        populations = [tuple(int(x)
+                             for x in instrument.read(args.dataset).split())]
+    if any(sum(population) < 2 for population in populations):
+        sys.exit('Populations must have at least 2 organisms')
+
+    if args.generations > 1 and args.simulations:
+        probs = simulate_generations(populations, args.generations,
+                                     args.simulations, args.seed)
+    elif args.generations > 1:
+        probs = get_generation_probabilities(populations, args.generations)
+    elif args.batch and import_numpy():
+        probs = 1 - get_offspring_probabilities(np.array(populations))[:, 2]
+    else:
+        probs = [get_probability(k, m, n) for k, m, n in populations]
+
+    for prob_dom_phenotype in probs:
+        print('{:.3f}'.format(prob_dom_phenotype))
+
+
+def import_numpy():
+    """Import NumPy if available, getting whether it is"""
 
-    # Genotype constants
-    HOM_DOM = 0
-    HET = 1
-    HOM_REC = 2
-    GENOTYPES = (HOM_DOM, HET, HOM_REC)
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def get_probability(k, m, n):
+    """Get probability of offspring with the dominant phenotype"""
 
     prob_dom_phenotype = 0
     population = [k, m, n]
@@ -45,7 +102,94 @@ def main(args):
                 prob_dom_phenotype += parent_prob * 1 / 2
         population[parent1] += 1  # Restore population
 
-    print('{:.3f}'.format(prob_dom_phenotype))
+    return prob_dom_phenotype
+
+
+def get_offspring_probabilities(populations):
+    """Get probabilities of each offspring genotype for an array of
+    populations (one per row), mating two different random organisms"""
+
+    populations = np.asarray(populations, dtype=np.float64)
+    offspring = np.array(OFFSPRING)
+    totals = populations.sum(axis=1)
+
+    # Pairs of organisms, less each organism paired with itself
+    pairs = np.einsum('ri,rj,ijk->rk', populations, populations, offspring)
+    pairs -= np.einsum('ri,iik->rk', populations, offspring)
+    return pairs / (totals * (totals - 1))[:, None]
+
+
+def get_generation_probabilities(populations, generations):
+    """Get probability of offspring with the dominant phenotype after some
+    generations, in which each population is replaced by as many offspring
+
+    Populations of the same size share a Markov chain over every possible
+    population of that size. The matrix of transitions between populations
+    would have a row and column per population (so O(N^4) for N organisms),
+    so it is applied a block of rows at a time instead, skipping populations
+    that can't have arisen.
+    """
+
+    probs = np.zeros(len(populations))
+    indices_for = {}
+    for i, population in enumerate(populations):
+        indices_for.setdefault(sum(population), []).append(i)
+
+    for total, indices in indices_for.items():
+        states = np.array([(k, m, total - k - m) for k in range(total + 1)
+                           for m in range(total + 1 - k)])
+        offspring = get_offspring_probabilities(states)
+        log_coefficients = get_log_multinomial_coefficients(states)
+        block_size = max(1, TRANSITIONS_BLOCK // len(states))
+        index_for = dict((tuple(state), i)
+                         for i, state in enumerate(states.tolist()))
+        dist = np.zeros((len(indices), len(states)))
+        for row, i in enumerate(indices):
+            dist[row, index_for[tuple(populations[i])]] = 1
+        for _ in range(generations - 1):
+            next_dist = np.zeros_like(dist)
+            sources = np.flatnonzero(dist.any(axis=0))
+            for start in range(0, len(sources), block_size):
+                block = sources[start:start + block_size]
+                next_dist += dist[:, block].dot(get_transitions(
+                    states, log_coefficients, offspring[block]))
+            dist = next_dist
+        probs[indices] = dist.dot(1 - offspring[:, 2])
+
+    return probs
+
+
+def get_log_multinomial_coefficients(states):
+    """Get log of multinomial coefficient of each population"""
+
+    total = states[0].sum()
+    log_factorials = np.concatenate(
+        ([0], np.cumsum(np.log(np.arange(1, total + 1)))))
+    return log_factorials[total] - log_factorials[states].sum(axis=1)
+
+
+def get_transitions(states, log_coefficients, offspring):
+    """Get matrix of probabilities of populations with some probabilities of
+    each offspring genotype (one per row) giving rise to each population"""
+
+    # Impossible genotypes get a huge (but finite) negative log, so a count
+    # of none of them still contributes nothing
+    with np.errstate(divide='ignore'):
+        log_offspring = np.maximum(np.log(offspring), -1e300)
+    return np.exp(log_coefficients + log_offspring.dot(states.T))
+
+
+def simulate_generations(populations, generations, simulations, seed=None):
+    """Estimate probability of offspring with the dominant phenotype after
+    some generations by simulating all populations together"""
+
+    rng = np.random.default_rng(seed)
+    counts = np.repeat(np.array(populations), simulations, axis=0)
+    totals = counts.sum(axis=1)
+    for _ in range(generations - 1):
+        counts = rng.multinomial(totals, get_offspring_probabilities(counts))
+    probs = 1 - get_offspring_probabilities(counts)[:, 2]
+    return probs.reshape(-1, simulations).mean(axis=1)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Mendel's First Law")
@@ -54,6 +198,27 @@ if __name__ == '__main__':
         help='Three positive integers k, m, and n, representing a population '
         'containing k+m+n organisms: k individuals are homozygous dominant for'
         'a factor, m are heterozygous, and n are homozygous recessive')
+    parser.add_argument(
+        '--batch', action='store_true',
+        help='Read three integers k, m and n per line and print the '
+        'probability for each')
+    parser.add_argument(
+        '--generations', metavar='N', type=int, default=1,
+        help='Print the probability for the N-th generation, each population '
+        'being replaced by as many offspring (default: 1)')
+    parser.add_argument(
+        '--simulations', metavar='N', type=int,
+        help='Estimate the probability with --generations from N simulations '
+        'of each population instead of exactly')
+    parser.add_argument(
+        '--seed', metavar='N', type=int,
+        help='Seed for random numbers with --simulations')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    if args.generations > 1 and not import_numpy():
+        parser.error('--generations requires NumPy')
+    if args.simulations and args.generations <= 1:
+        parser.error('--simulations requires --generations greater than 1')
+
+    instrument.run(main, args)
@@ -6,57 +6,328 @@ collection".
 """
 
 import argparse
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import read_fasta  # noqa: E402
+
+# Bit per base of each base's 4-bit code, so a bitwise AND of two codes has
+# a bit set per matching base
+BASE_BITS = {'A': 1, 'C': 2, 'G': 4, 'T': 8}
 
 
 def main(args):
     """Finding a Shared Motif"""
 
-    seqs = sorted([seq for _, seq in read_fasta(args.dataset)], key=len)
+    seqs = sorted([seq for _, seq
+                   in instrument.iterate('parse', read_fasta(args.dataset))],
+                  key=len)
 
-    print(lcs(seqs))
+    if args.mismatches or args.min_seqs:
+        print(approximate_lcs(seqs, args.mismatches, args.min_seqs))
+    elif args.brute_force:
+        print(lcs_brute_force(seqs))
+    else:
+        print(lcs(seqs))
 
 
-def read_fasta(file):
-    """Read FASTA file record by record"""
+def lcs(seqs):
+    """Find longest common substring using a suffix automaton"""
 
-    id = None
-    seq = []
-    for line in file:
-        line = line.rstrip()
-        if line.startswith('>'):
-            if id:
-                yield(id, ''.join(seq))
-            id = line.lstrip('>')
-            seq = []
-        else:
-            seq.append(line)
-    if id:
-        yield(id, ''.join(seq))
+    # Build automaton for the shortest sequence and then find, for each of its
+    # states, the longest match shared with every other sequence
+    shortest = min(range(len(seqs)), key=lambda i: len(seqs[i]))
+    shortest_seq = seqs[shortest]
+    automaton = SuffixAutomaton(shortest_seq)
+    common = automaton.length[:]
+    for i, seq in enumerate(seqs):
+        if i == shortest:
+            continue
+        for state, match in enumerate(automaton.match_lengths(seq)):
+            if match < common[state]:
+                common[state] = match
+        if not any(common):
+            return ''
 
+    # Pick longest, breaking ties by earliest start in the shortest sequence
+    best_length = 0
+    best_start = 0
+    for state, length in enumerate(common):
+        start = automaton.first_end[state] - length + 1
+        if length > best_length or \
+                (length == best_length and start < best_start):
+            best_length = length
+            best_start = start
 
-def lcs(seqs):
-    """Find longest common substring"""
+    return shortest_seq[best_start:best_start + best_length]
+
+
+def lcs_brute_force(seqs):
+    """Find longest common substring by checking every substring (slow, but
+    useful for cross-checking lcs)"""
 
-    shortest_seq = seqs.pop(0)
+    shortest_seq = seqs[0]
     shortest_len = len(shortest_seq)
-    motif = ''
-    for motif_length in range(shortest_len + 1, 1, -1):
-        for start in range(1, shortest_len - motif_length + 2):
+    for motif_length in range(shortest_len, 0, -1):
+        for start in range(0, shortest_len - motif_length + 1):
             motif = shortest_seq[start:start+motif_length]
             got_lcs = True
-            for seq in seqs:
+            for seq in seqs[1:]:
                 if seq.find(motif) == -1:
                     got_lcs = False
                     break
             if got_lcs:
                 return motif
 
+    return ''
+
+
+def approximate_lcs(seqs, mismatches, min_seqs=None):
+    """Find longest substring of any sequence that occurs with at most some
+    mismatches in every sequence (or at least min_seqs of them)
+
+    Lengths are binary searched, since every substring of such a motif is
+    also one.
+    """
+
+    if min_seqs is None:
+        min_seqs = len(seqs)
+    if not 0 < min_seqs <= len(seqs):
+        return ''
+
+    codes = [get_code(seq) for seq in seqs]
+    index = SeedIndex(seqs)
+    best = ''
+    low = 0
+    high = sorted((len(seq) for seq in seqs), reverse=True)[min_seqs - 1]
+    while low < high:
+        length = (low + high + 1) // 2
+        motif = find_approximate_motif(seqs, codes, index, length,
+                                       mismatches, min_seqs)
+        if motif is None:
+            high = length - 1
+        else:
+            low = length
+            best = motif
+
+    return best
+
+
+def find_approximate_motif(seqs, codes, index, length, mismatches,
+                           min_seqs):
+    """Find first substring of a length that occurs with at most some
+    mismatches in at least min_seqs sequences, or None
+
+    By the pigeonhole principle, any occurrence matches one of mismatches + 1
+    pieces of the substring exactly, so only positions sharing a seed with
+    the substring are compared, a whole substring at a time using codes of
+    4 bits per base. A substring is given up on if too few sequences have any
+    of its pieces (found from bitmasks of the sequences having each k-mer),
+    or as soon as too few sequences are left for it, checking first the
+    sequence that last ruled one out.
+    """
+
+    if length <= mismatches or min_seqs == 1:
+        # Matches anywhere (or only needs to match itself)
+        return next(seq[:length] for seq in seqs if len(seq) >= length)
+
+    seed = length // (mismatches + 1)
+    offsets = range(0, seed * (mismatches + 1), seed)
+    positions_for, seqs_for = index.get(seed)
+    mask = (1 << (4 * length)) - 1
+    order = list(range(len(seqs)))
+
+    for i, seq in enumerate(seqs):
+        code = codes[i]
+        for start in range(len(seq) - length + 1):
+            pieces = [(offset, seq[start + offset:start + offset + seed])
+                      for offset in offsets]
+            candidates = 0
+            for _, piece in pieces:
+                candidates |= seqs_for[piece]
+            candidates &= ~(1 << i)
+            unchecked = bin(candidates).count('1')
+            if unchecked + 1 < min_seqs:
+                continue
+
+            motif = (code >> (4 * start)) & mask
+            found = 1
+            for rank, j in enumerate(order):
+                if not (candidates >> j) & 1:
+                    continue
+                unchecked -= 1
+                if occurs_approximately(motif, codes[j], len(seqs[j]),
+                                        positions_for[j], pieces, length,
+                                        mask, mismatches):
+                    found += 1
+                    if found >= min_seqs:
+                        return seq[start:start + length]
+                elif found + unchecked < min_seqs:
+                    order.insert(0, order.pop(rank))
+                    break
+
+    return None
+
+
+def occurs_approximately(motif, code, seq_length, positions_for, pieces,
+                         length, mask, mismatches):
+    """Check whether a motif (as a code) occurs with at most some mismatches
+    in a sequence (as a code) at any position sharing a piece"""
+
+    checked = set()
+    for offset, piece in pieces:
+        for pos in positions_for.get(piece, ()):
+            begin = pos - offset
+            if begin < 0 or begin + length > seq_length or begin in checked:
+                continue
+            checked.add(begin)
+            target = (code >> (4 * begin)) & mask
+            if length - bin(motif & target).count('1') <= mismatches:
+                return True
+    return False
+
+
+def get_code(seq):
+    """Get sequence as an integer of 4 bits per base (first base lowest),
+    with no bits set for anything other than a base"""
+
+    code = 0
+    for base in reversed(seq):
+        code = (code << 4) | BASE_BITS.get(base, 0)
+    return code
+
+
+class SeedIndex(object):
+    """Positions of every k-mer (for the last k asked for) in each sequence,
+    and bitmask of the sequences having each k-mer
+
+    Only one index is kept, as each takes memory proportional to the total
+    length of the sequences; lengths binary searched with the same seed
+    length share it.
+    """
+
+    def __init__(self, seqs):
+        self.seqs = seqs
+        self.seed = None
+        self.index = None
+
+    def get(self, seed):
+        """Get dict of positions of each k-mer of a length for each sequence
+        and dict of bitmask of sequences for each k-mer"""
+
+        if seed != self.seed:
+            self.index = None  # Free the old index first
+            positions_for = []
+            seqs_for = {}
+            for i, seq in enumerate(self.seqs):
+                positions = {}
+                for pos in range(len(seq) - seed + 1):
+                    positions.setdefault(seq[pos:pos + seed], []).append(pos)
+                positions_for.append(positions)
+                for kmer in positions:
+                    seqs_for[kmer] = seqs_for.get(kmer, 0) | (1 << i)
+            self.seed = seed
+            self.index = positions_for, seqs_for
+        return self.index
+
+
+class SuffixAutomaton(object):
+    """Suffix automaton recognising every substring of a sequence"""
+
+    def __init__(self, seq):
+        self.next = [{}]
+        self.link = [-1]
+        self.length = [0]
+        self.first_end = [-1]  # End position of first occurrence
+
+        last = 0
+        for pos, base in enumerate(seq):
+            cur = self._add_state(self.length[last] + 1, pos)
+            state = last
+            while state != -1 and base not in self.next[state]:
+                self.next[state][base] = cur
+                state = self.link[state]
+            if state == -1:
+                self.link[cur] = 0
+            else:
+                target = self.next[state][base]
+                if self.length[state] + 1 == self.length[target]:
+                    self.link[cur] = target
+                else:
+                    clone = self._add_state(self.length[state] + 1,
+                                            self.first_end[target])
+                    self.next[clone] = dict(self.next[target])
+                    self.link[clone] = self.link[target]
+                    while state != -1 and self.next[state].get(base) == target:
+                        self.next[state][base] = clone
+                        state = self.link[state]
+                    self.link[target] = clone
+                    self.link[cur] = clone
+            last = cur
+
+        # States ordered by decreasing length, for propagating along links
+        by_length = [[] for _ in range(len(seq) + 1)]
+        for state, length in enumerate(self.length):
+            by_length[length].append(state)
+        self.order = [state for states in reversed(by_length)
+                      for state in states]
+
+    def _add_state(self, length, first_end):
+        """Add a state and return its number"""
+
+        self.next.append({})
+        self.link.append(-1)
+        self.length.append(length)
+        self.first_end.append(first_end)
+        return len(self.length) - 1
+
+    def match_lengths(self, seq):
+        """Get longest substring of seq matching a string of each state"""
+
+        next = self.next
+        link = self.link
+        length = self.length
+        match = [0] * len(length)
+
+        state = 0
+        matched = 0
+        for base in seq:
+            while state and base not in next[state]:
+                state = link[state]
+                matched = length[state]
+            if base in next[state]:
+                state = next[state][base]
+                matched += 1
+            if matched > match[state]:
+                match[state] = matched
+
+        # A match in a state is also a full match of its suffix link's strings
+        for state in self.order:
+            if match[state] and link[state] > 0:
+                match[link[state]] = length[link[state]]
+
+        return match
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Finding a Shared Motif')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A collection of k (k≤100) DNA strings '
         'of length at most 1 kbp each in FASTA format')
+    parser.add_argument(
+        '--brute-force', action='store_true',
+        help='Use slow brute-force search (for cross-checking)')
+    parser.add_argument(
+        '--mismatches', metavar='D', type=int, default=0,
+        help='Find longest motif occurring with up to D mismatches')
+    parser.add_argument(
+        '--min-seqs', metavar='Q', type=int,
+        help='Find longest motif occurring in at least Q of the sequences '
+        '(default: all)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -5,15 +5,21 @@ length at most 10 kbp)" and returns "The protein string encoded by s".
 """
 
 import argparse
+import os
+import sys
 from Bio.Seq import Seq
 from Bio.Alphabet import generic_rna
 
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+
 
 def main(args):
     """Translating RNA into Protein"""
 
-    s = Seq(args.dataset.read().rstrip(), generic_rna)
-    print(s.translate(stop_symbol=''))
+    s = Seq(instrument.read(args.dataset).rstrip(), generic_rna)
+    print(s.translate(table=args.genetic_code, stop_symbol=''))
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -22,6 +28,10 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='An RNA string s corresponding to a strand of mRNA '
         '(of length at most 10 kbp)')
+    parser.add_argument(
+        '--genetic-code', metavar='ID', type=int, default=1,
+        help='NCBI genetic code table (default: 1)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
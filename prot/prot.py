@@ -5,92 +5,155 @@ length at most 10 kbp)" and returns "The protein string encoded by s".
 """
 
 import argparse
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+
+# Amino acids (with * for stop) for each NCBI genetic code, for codons ordered
+# UUU, UUC, UUA, UUG, UCU, ... GGG
+GENETIC_CODES = {
+    # Standard
+    1: 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Vertebrate Mitochondrial
+    2: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSS**VVVVAAAADDEEGGGG',
+    # Yeast Mitochondrial
+    3: 'FFLLSSSSYY**CCWWTTTTPPPPHHQQRRRRIIMMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Mold Mitochondrial
+    4: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Invertebrate Mitochondrial
+    5: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSSSVVVVAAAADDEEGGGG',
+    # Ciliate Nuclear
+    6: 'FFLLSSSSYYQQCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Echinoderm Mitochondrial
+    9: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG',
+    # Euplotid Nuclear
+    10: 'FFLLSSSSYY**CCCWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Bacterial
+    11: 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Alternative Yeast Nuclear
+    12: 'FFLLSSSSYY**CC*WLLLSPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Ascidian Mitochondrial
+    13: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSGGVVVVAAAADDEEGGGG',
+    # Alternative Flatworm Mitochondrial
+    14: 'FFLLSSSSYYY*CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG',
+    # Blepharisma Macronuclear
+    15: 'FFLLSSSSYY*QCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Chlorophycean Mitochondrial
+    16: 'FFLLSSSSYY*LCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Trematode Mitochondrial
+    21: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNNKSSSSVVVVAAAADDEEGGGG',
+    # Scenedesmus obliquus Mitochondrial
+    22: 'FFLLSS*SYY*LCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Thraustochytrium Mitochondrial
+    23: 'FF*LSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Pterobranchia Mitochondrial
+    24: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSSKVVVVAAAADDEEGGGG',
+    # Candidate Division SR1
+    25: 'FFLLSSSSYY**CCGWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Pachysolen tannophilus Nuclear
+    26: 'FFLLSSSSYY**CC*WLLLAPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Karyorelict Nuclear
+    27: 'FFLLSSSSYYQQCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Condylostoma Nuclear
+    28: 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Mesodinium Nuclear
+    29: 'FFLLSSSSYYYYCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Peritrich Nuclear
+    30: 'FFLLSSSSYYEECC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Blastocrithidia Nuclear
+    31: 'FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Balanophoraceae Plastid
+    32: 'FFLLSSSSYY*WCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG',
+    # Cephalodiscidae Mitochondrial
+    33: 'FFLLSSSSYYY*CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSSKVVVVAAAADDEEGGGG',
+}
+
+# Order of bases in genetic codes (DNA T is treated the same as U)
+BASES = 'UCAG'
+
+# Code for anything other than a base, which translates to X
+UNKNOWN = len(BASES)
+
+# Table for converting bases to codes with bytes.translate
+BASE_CODES = bytearray([UNKNOWN] * 256)
+for code, base in enumerate(BASES):
+    BASE_CODES[ord(base)] = BASE_CODES[ord(base.lower())] = code
+BASE_CODES[ord('T')] = BASE_CODES[ord('t')] = BASES.index('U')
+BASE_CODES = bytes(BASE_CODES)
+
+# Whitespace removed before translating
+WHITESPACE = b' \t\r\n'
 
 
 def main(args):
     """Translating RNA into Protein"""
 
-    AMINO_ACID_FOR = {
-        'AAA': 'K',
-        'AAC': 'N',
-        'AAG': 'K',
-        'AAU': 'N',
-        'ACA': 'T',
-        'ACC': 'T',
-        'ACG': 'T',
-        'ACU': 'T',
-        'AGA': 'R',
-        'AGC': 'S',
-        'AGG': 'R',
-        'AGU': 'S',
-        'AUA': 'I',
-        'AUC': 'I',
-        'AUG': 'M',
-        'AUU': 'I',
-        'CAA': 'Q',
-        'CAC': 'H',
-        'CAG': 'Q',
-        'CAU': 'H',
-        'CCA': 'P',
-        'CCC': 'P',
-        'CCG': 'P',
-        'CCU': 'P',
-        'CGA': 'R',
-        'CGC': 'R',
-        'CGG': 'R',
-        'CGU': 'R',
-        'CUA': 'L',
-        'CUC': 'L',
-        'CUG': 'L',
-        'CUU': 'L',
-        'GAA': 'E',
-        'GAC': 'D',
-        'GAG': 'E',
-        'GAU': 'D',
-        'GCA': 'A',
-        'GCC': 'A',
-        'GCG': 'A',
-        'GCU': 'A',
-        'GGA': 'G',
-        'GGC': 'G',
-        'GGG': 'G',
-        'GGU': 'G',
-        'GUA': 'V',
-        'GUC': 'V',
-        'GUG': 'V',
-        'GUU': 'V',
-        'UAA': '',
-        'UAC': 'Y',
-        'UAG': '',
-        'UAU': 'Y',
-        'UCA': 'S',
-        'UCC': 'S',
-        'UCG': 'S',
-        'UCU': 'S',
-        'UGA': '',
-        'UGC': 'C',
-        'UGG': 'W',
-        'UGU': 'C',
-        'UUA': 'L',
-        'UUC': 'F',
-        'UUG': 'L',
-        'UUU': 'F',
-    }
-
-    s = args.dataset.read().rstrip()
-
-    # Translate
-    peptide = []
-    for codon in get_codon(s):
-        peptide.append(AMINO_ACID_FOR[codon])
-    print(''.join(peptide))
-
-
-def get_codon(rna):
-    """Get RNA codon by codon"""
-
-    for i in range(0, len(rna), 3):
-        yield rna[i:i+3]
+    table = get_translation_table(args.genetic_code)
+    stream = getattr(args.dataset, 'buffer', args.dataset)
+
+    for peptide in translate(stream, table, args.chunk_size):
+        sys.stdout.write(peptide.decode('ascii'))
+    sys.stdout.write('\n')
+
+
+def get_translation_table(genetic_code):
+    """Get table of amino acids indexed by codon code"""
+
+    # Codon code is a base 5 number so codons including unknown bases have
+    # their own entries
+    table = bytearray(b'X' * (UNKNOWN + 1) ** 3)
+    for codon, amino_acid in enumerate(GENETIC_CODES[genetic_code]):
+        base1, base2, base3 = codon // 16, codon // 4 % 4, codon % 4
+        table[get_codon_code(base1, base2, base3)] = ord(amino_acid)
+
+    return bytes(table)
+
+
+def get_codon_code(base1, base2, base3):
+    """Get codon code from base codes"""
+
+    return (base1 * (UNKNOWN + 1) + base2) * (UNKNOWN + 1) + base3
+
+
+def translate(stream, table, chunk_size):
+    """Translate stream chunk by chunk, carrying codons split across chunks
+    into the next chunk"""
+
+    partial = b''
+    while True:
+        with instrument.stage('parse'):
+            chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii')
+        codes = partial + chunk.translate(BASE_CODES, WHITESPACE)
+        end = len(codes) - len(codes) % 3
+        partial = codes[end:]
+        yield translate_codes(codes[:end], table)
+
+
+def translate_codes(codes, table):
+    """Translate whole codons of base codes, omitting stop codons"""
+
+    if np is not None:
+        codes = np.frombuffer(codes, dtype=np.uint8).astype(np.intp)
+        codon_codes = get_codon_code(codes[0::3], codes[1::3], codes[2::3])
+        peptide = np.frombuffer(table, dtype=np.uint8)[codon_codes].tobytes()
+    else:
+        codes = iter(bytearray(codes))
+        peptide = bytes(bytearray(table[get_codon_code(*codon)]
+                                  for codon in zip(codes, codes, codes)))
+
+    return peptide.translate(None, b'*')
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -99,6 +162,14 @@ if __name__ == '__main__':
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='An RNA string s corresponding to a strand of mRNA '
         '(of length at most 10 kbp)')
+    parser.add_argument(
+        '--genetic-code', metavar='ID', type=int, default=1,
+        choices=sorted(GENETIC_CODES),
+        help='NCBI genetic code table (default: 1)')
+    parser.add_argument(
+        '--chunk-size', metavar='BYTES', type=int, default=16 * 1024 * 1024,
+        help='Size of chunks read at a time (default: 16 MiB)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -4,6 +4,7 @@
 returns "The reverse complement sc of s".
 """
 
+import os
 import sys
 import argparse
 
@@ -14,20 +15,116 @@ else:
     import string
     maketrans = string.maketrans
 
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import FastaFile, read_chunks  # noqa: E402
+
+# Complements of bases and other IUPAC symbols, for streaming
+COMPLEMENT = bytes.maketrans(b'ACGTURYSWKMBDHVNacgturyswkmbdhvn',
+                             b'TGCAAYRSWMKVHDBNtgcaayrswmkvhdbn')
+
+# Whitespace removed when streaming
+WHITESPACE = b' \t\r\n'
+
 
 def main(args):
     """Complementing a Strand of DNA"""
 
-    s = args.dataset.read()
+    if args.stream:
+        stream_revcomp(args.dataset, args.block_size, args.line_width)
+        return
 
+    if args.packed:
+        # Imported only here, as it imports NumPy
+        from rosalind.packed import CHUNK_SIZE, PackedSeq
+        stream = getattr(args.dataset, 'buffer', args.dataset)
+        s = PackedSeq.from_chunks(instrument.iterate(
+            'parse', read_chunks(stream, CHUNK_SIZE)))
+        out = getattr(sys.stdout, 'buffer', sys.stdout)
+        sys.stdout.flush()
+        s.reverse_complement().write(out)
+        out.write(b'\n')
+        return
+
+    s = instrument.read(args.dataset)
     print(s.rstrip().translate(maketrans('ACGT', 'TGCA'))[::-1])
 
+
+def stream_revcomp(file, block_size, line_width):
+    """Write reverse complement of each record, reading backwards through the
+    memory-mapped file a block at a time"""
+
+    out = sys.stdout.buffer if hasattr(sys.stdout, 'buffer') else sys.stdout
+    sys.stdout.flush()
+    fasta = FastaFile(file)
+    mm = fasta.map
+    if mm is None:
+        # Pipes and empty files can't be mapped (and can't be read backwards)
+        # so read the whole input into memory
+        stream = fasta.lines()
+        mm = instrument.read(getattr(stream, 'buffer', stream))
+
+    if mm[:1] != b'>' and mm.find(b'\n>') == -1:
+        write_wrapped(out, get_revcomp_blocks(mm, 0, len(mm), block_size),
+                      line_width)
+    else:
+        for id, start, end in fasta.records(mm):
+            out.write(b'>' + id.encode('ascii') + b'\n')
+            write_wrapped(out, get_revcomp_blocks(mm, start, end, block_size),
+                          60 if line_width is None else line_width)
+    out.flush()
+
+
+def get_revcomp_blocks(mm, start, end, block_size):
+    """Get reverse complement of region of memory map block by block, from the
+    end of the region"""
+
+    while end > start:
+        block_start = max(start, end - block_size)
+        yield mm[block_start:end].translate(COMPLEMENT, WHITESPACE)[::-1]
+        end = block_start
+
+
+def write_wrapped(out, blocks, line_width):
+    """Write blocks of sequence wrapped into lines (unless line_width is 0)"""
+
+    partial = b''
+    for block in blocks:
+        if not line_width:
+            out.write(block)
+            continue
+        block = partial + block
+        end = len(block) - len(block) % line_width
+        if end:
+            out.write(b'\n'.join(block[pos:pos + line_width]
+                                 for pos in range(0, end, line_width)))
+            out.write(b'\n')
+        partial = block[end:]
+    if partial or not line_width:
+        out.write(partial + b'\n')
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Complementing a Strand of DNA')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A DNA string s of length at most 1000 bp')
+    parser.add_argument(
+        '--packed', action='store_true',
+        help='Hold sequence packed into 2 bits per base')
+    parser.add_argument(
+        '--stream', action='store_true',
+        help='Read memory-mapped input backwards a block at a time, '
+        'reverse complementing each record of a FASTA file')
+    parser.add_argument(
+        '--block-size', metavar='BYTES', type=int, default=4 * 1024 * 1024,
+        help='Size of blocks with --stream (default: 4 MiB)')
+    parser.add_argument(
+        '--line-width', metavar='N', type=int,
+        help='Wrap output lines with --stream (default: 60 for FASTA, '
+        '0 for no wrapping otherwise)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -6,25 +6,62 @@ having length between 4 and 12. You may return these pairs in any order".
 """
 
 import argparse
+import os
+import sys
 from Bio import SeqIO
 from Bio.Alphabet import generic_dna
 
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import open_text  # noqa: E402
+
 
 def main(args):
     """Locating Restriction Sites"""
 
-    record = next(SeqIO.parse(args.dataset, 'fasta', generic_dna))
+    record = next(instrument.iterate(
+        'parse', SeqIO.parse(open_text(args.dataset), 'fasta', generic_dna)))
     seq = str(record.seq)
     revc = str(record.reverse_complement().seq)
 
-    for pos in range(len(seq)):
-        for length in range(2, 6 + 1):
-            if pos + length * 2 > len(seq):
-                continue
-            seq1 = seq[pos:pos + length]
-            seq2 = revc[-(pos + 2 * length):-(pos + length)]
-            if seq1 == seq2:
-                print('{:d} {:d}'.format(pos + 1, length * 2))
+    min_half = (args.min_length + 1) // 2
+    max_half = args.max_length // 2
+    for centre, half in get_reverse_palindromes(seq, revc, max_half):
+        if half < min_half:
+            continue
+        if args.maximal:
+            print('{:d} {:d}'.format(centre - half + 1, half * 2))
+            continue
+        for length in range(min_half, half + 1):
+            print('{:d} {:d}'.format(centre - length + 1, length * 2))
+
+
+def get_reverse_palindromes(seq, revc, max_half):
+    """Get (centre, half length) of the longest reverse palindrome (up to
+    max_half) centred before each position, Manacher-style"""
+
+    # Mirror lookups never reach further back than the longest palindrome, so
+    # only a ring buffer of recent half lengths is kept
+    size = 2 * max_half + 2
+    halves = [0] * size
+    left, right = 0, -1
+    for centre in range(len(seq)):
+        if centre > right:
+            half = 0
+        else:
+            half = min(halves[(left + right - centre + 1) % size],
+                       right - centre + 1)
+        # The complement of seq[centre - half - 1] is revc[-(centre - half)]
+        while half < max_half and centre + half < len(seq) and \
+                half < centre and seq[centre + half] in 'ACGT' and \
+                seq[centre + half] == revc[len(seq) - centre + half]:
+            half += 1
+        halves[centre % size] = half
+        if centre + half - 1 > right:
+            left, right = centre - half, centre + half - 1
+        if half:
+            yield centre, half
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -32,6 +69,16 @@ if __name__ == '__main__':
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A DNA string of length at most 1 kbp in FASTA format')
+    parser.add_argument(
+        '--min-length', metavar='LENGTH', type=int, default=4,
+        help='Minimum length of reverse palindromes (default: 4)')
+    parser.add_argument(
+        '--max-length', metavar='LENGTH', type=int, default=12,
+        help='Maximum length of reverse palindromes (default: 12)')
+    parser.add_argument(
+        '--maximal', action='store_true',
+        help='Only print the longest reverse palindrome at each centre')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
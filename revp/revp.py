@@ -5,54 +5,77 @@ and returns "The position and length of every reverse palindrome in the string
 having length between 4 and 12. You may return these pairs in any order".
 """
 
-import sys
 import argparse
+import os
+import sys
 
-# Ensure maketrans works in Python 2 and 3
-if sys.version_info[0] >= 3:
-    maketrans = str.maketrans
-else:
-    import string
-    maketrans = string.maketrans
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument, output  # noqa: E402
+from rosalind.fasta import FastaFile, read_fasta_bytes  # noqa: E402
+
+# Complement of each byte (anything other than a base never matches)
+COMPLEMENT = bytearray(256)
+for base, complement in zip(b'ACGT', b'TGCA'):
+    COMPLEMENT[base] = complement
+COMPLEMENT = bytes(COMPLEMENT)
 
 
 def main(args):
     """Locating Restriction Sites"""
 
-    _, seq = next(read_fasta(args.dataset))
+    if args.record:
+        with instrument.stage('parse'):
+            seq = FastaFile(args.dataset).fetch(args.record)
+    else:
+        _, seq = next(instrument.iterate('parse',
+                                         read_fasta_bytes(args.dataset)))
 
-    for pos in range(len(seq)):
-        for length in range(2, 6 + 1):
-            if pos + length * 2 > len(seq):
-                continue
-            seq1 = seq[pos:pos + length]
-            seq2 = revcomp(seq[pos + length:pos + 2 * length])
-            if seq1 == seq2:
-                print('{:d} {:d}'.format(pos + 1, length * 2))
+    with output.Writer(args.output, args.format, columns=2) as writer:
+        writer.write_rows(get_restriction_sites(
+            seq, args.min_length, args.max_length, args.maximal))
 
 
-def revcomp(seq):
-    """Reverse complement a DNA sequence"""
+def get_restriction_sites(seq, min_length, max_length, maximal=False):
+    """Get (position, length) of reverse palindromes (only the longest at
+    each centre if maximal)"""
 
-    return(seq.translate(maketrans('ACGT', 'TGCA'))[::-1])
+    min_half = (min_length + 1) // 2
+    max_half = max_length // 2
+    for centre, half in get_reverse_palindromes(seq, max_half):
+        if half < min_half:
+            continue
+        if maximal:
+            yield centre - half + 1, half * 2
+            continue
+        for length in range(min_half, half + 1):
+            yield centre - length + 1, length * 2
 
 
-def read_fasta(file):
-    """Read FASTA file record by record"""
+def get_reverse_palindromes(seq, max_half):
+    """Get (centre, half length) of the longest reverse palindrome (up to
+    max_half) centred before each position, Manacher-style"""
 
-    id = None
-    seq = []
-    for line in file:
-        line = line.rstrip()
-        if line.startswith('>'):
-            if id:
-                yield(id, ''.join(seq))
-            id = line.lstrip('>')
-            seq = []
+    # Mirror lookups never reach further back than the longest palindrome, so
+    # only a ring buffer of recent half lengths is kept
+    size = 2 * max_half + 2
+    halves = [0] * size
+    left, right = 0, -1
+    for centre in range(len(seq)):
+        if centre > right:
+            half = 0
         else:
-            seq.append(line)
-    if id:
-        yield(id, ''.join(seq))
+            half = min(halves[(left + right - centre + 1) % size],
+                       right - centre + 1)
+        while half < max_half and centre + half < len(seq) and \
+                half < centre and \
+                seq[centre + half] == COMPLEMENT[seq[centre - half - 1]]:
+            half += 1
+        halves[centre % size] = half
+        if centre + half - 1 > right:
+            left, right = centre - half, centre + half - 1
+        if half:
+            yield centre, half
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -60,6 +83,21 @@ if __name__ == '__main__':
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='A DNA string of length at most 1 kbp in FASTA format')
+    parser.add_argument(
+        '--record', metavar='ID',
+        help='ID of the record to use (found via a .fai index) '
+        'instead of the first')
+    parser.add_argument(
+        '--min-length', metavar='LENGTH', type=int, default=4,
+        help='Minimum length of reverse palindromes (default: 4)')
+    parser.add_argument(
+        '--max-length', metavar='LENGTH', type=int, default=12,
+        help='Maximum length of reverse palindromes (default: 12)')
+    parser.add_argument(
+        '--maximal', action='store_true',
+        help='Only print the longest reverse palindrome at each centre')
+    output.add_arguments(parser, 'pairs of position and length')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
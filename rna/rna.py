@@ -6,20 +6,95 @@ returns "The transcribed RNA string of t".
 
 from __future__ import print_function
 import argparse
+import io
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
+from rosalind.fasta import read_chunks, split_headers  # noqa: E402
+
+# Table for transcribing with bytes.translate
+TRANSCRIBE = bytes.maketrans(b'Tt', b'Uu')
 
 
 def main(args):
     """Transcribing DNA into RNA"""
 
-    t = args.dataset.read()
+    if args.stream:
+        stream_transcribe(args.dataset, args.chunk_size, args.buffer_size)
+        return
 
+    if args.packed:
+        # Imported only here, as it imports NumPy
+        from rosalind.packed import CHUNK_SIZE, PackedSeq
+        stream = getattr(args.dataset, 'buffer', args.dataset)
+        t = PackedSeq.from_chunks(instrument.iterate(
+            'parse', read_chunks(stream, CHUNK_SIZE)))
+        out = getattr(sys.stdout, 'buffer', sys.stdout)
+        sys.stdout.flush()
+        t.transcribe().write(out)
+        out.write(b'\n')
+        return
+
+    t = instrument.read(args.dataset)
     print(t.replace('T', 'U'), end='')
 
+
+def stream_transcribe(file, chunk_size, buffer_size):
+    """Transcribe file chunk by chunk through a large output buffer"""
+
+    stream = getattr(file, 'buffer', file)
+    sys.stdout.flush()
+    in_header = False
+    try:
+        out = io.open(sys.stdout.fileno(), 'wb', buffering=buffer_size,
+                      closefd=False)
+    except (io.UnsupportedOperation, AttributeError):
+        # Not a real file (e.g. output captured in a batch), so write to its
+        # own buffer, which mustn't be closed
+        out = None
+    try:
+        for chunk in instrument.iterate('parse',
+                                        read_chunks(stream, chunk_size)):
+            chunk, in_header = transcribe_chunk(chunk, in_header)
+            (out or sys.stdout.buffer).write(chunk)
+    finally:
+        if out is not None:
+            out.close()
+
+
+def transcribe_chunk(chunk, in_header=False):
+    """Transcribe fixed-size chunk, leaving FASTA headers unchanged, getting
+    it and whether it ends inside a header line"""
+
+    if not in_header and b'>' not in chunk:
+        return chunk.translate(TRANSCRIBE), False
+
+    parts, in_header = split_headers(chunk, in_header)
+    return b''.join(part if is_header else part.translate(TRANSCRIBE)
+                    for is_header, part in parts), in_header
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Transcribing DNA into RNA')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='File containing "A DNA string t having length at most 1000 nt')
+    parser.add_argument(
+        '--packed', action='store_true',
+        help='Hold sequence packed into 2 bits per base')
+    parser.add_argument(
+        '--stream', action='store_true',
+        help='Transcribe chunk by chunk (also accepts FASTA, leaving header '
+        'lines unchanged)')
+    parser.add_argument(
+        '--chunk-size', metavar='BYTES', type=int, default=16 * 1024 * 1024,
+        help='Size of chunks read with --stream (default: 16 MiB)')
+    parser.add_argument(
+        '--buffer-size', metavar='BYTES', type=int, default=16 * 1024 * 1024,
+        help='Size of output buffer with --stream (default: 16 MiB)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
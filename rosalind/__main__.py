@@ -0,0 +1,187 @@
+"""Run the solution to a Rosalind problem, loading only the script needed.
+
+    rosalind <problem> [--backend pure|biopython] [ARGS...]
+
+ARGS are passed to the problem's script. With --worker, the script is instead
+run again for each line read from stdin (or from each connection to a local
+socket with --socket), the line's arguments (usually just a dataset path)
+being appended to ARGS. Any modules the script imports (e.g. Bio.SeqIO) are
+then only imported once. Given --socket without --worker, the arguments are
+sent to a worker listening on that socket and its output printed.
+"""
+
+import argparse
+import os
+import shlex
+import socket
+import sys
+import traceback
+import types
+
+# Top-level directory, which has a directory for each problem
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Suffixes of each backend's script
+SUFFIX_FOR = {'pure': '.py', 'biopython': '-biopython.py'}
+
+# Compiled scripts, by path
+code_for = {}
+
+
+def main(argv=None):
+    """Parse arguments and run, serve or send to a worker"""
+
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        prog='rosalind', usage='%(prog)s PROBLEM [--backend BACKEND] '
+        '[--worker] [--socket PATH] [ARGS...]',
+        description='Solutions to Rosalind problems',
+        epilog='Problems: ' + ', '.join(get_problems()),
+        add_help=False, allow_abbrev=False)
+    parser.add_argument(
+        '--backend', choices=sorted(SUFFIX_FOR), default='pure',
+        help='Which solution to run (default: pure)')
+    parser.add_argument(
+        '--worker', action='store_true',
+        help='Read arguments for each run line by line from stdin (or '
+        'connections to --socket)')
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help='Local socket to listen on with --worker, or else to send '
+        'arguments to')
+
+    if not argv or argv[0] in ('-h', '--help'):
+        parser.print_help()
+        return
+    problem = argv[0]
+    args, script_args = parser.parse_known_args(argv[1:])
+
+    if args.socket and not args.worker:
+        send(args.socket, script_args)
+        return
+
+    path = get_script(problem, args.backend)
+    if path is None:
+        parser.error('no {:s} solution to problem {!r}'.format(
+            args.backend, problem))
+
+    if not args.worker:
+        run(path, script_args)
+    elif args.socket:
+        serve(path, script_args, args.socket)
+    else:
+        run_lines(path, script_args, sys.stdin)
+
+
+def get_problems():
+    """Get names of all problems with a solution"""
+
+    return sorted(name for name in os.listdir(ROOT)
+                  if os.path.isfile(os.path.join(ROOT, name, name + '.py')))
+
+
+def get_script(problem, backend):
+    """Get path of a problem's script for a backend, or None"""
+
+    path = os.path.join(ROOT, problem, problem + SUFFIX_FOR[backend])
+    return path if os.path.isfile(path) else None
+
+
+def run(path, args):
+    """Run a script as if from the command line, without reading and compiling
+    it again if it has already been run"""
+
+    if path not in code_for:
+        with open(path) as fh:
+            code_for[path] = compile(fh.read(), path, 'exec')
+
+    # Run as __main__ so worker processes can find the script's functions
+    module = types.ModuleType('__main__')
+    module.__file__ = path
+    saved_main = sys.modules['__main__']
+    saved_argv, saved_path = sys.argv, sys.path[:]
+    sys.modules['__main__'] = module
+    sys.argv = [path] + list(args)
+    try:
+        exec(code_for[path], module.__dict__)
+    finally:
+        sys.modules['__main__'] = saved_main
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        sys.stdout.flush()
+
+
+def run_lines(path, args, lines):
+    """Run a script for each line of arguments, reporting failures on stderr
+    without stopping"""
+
+    for line in lines:
+        line_args = shlex.split(line)
+        if not line_args:
+            continue
+        try:
+            run(path, args + line_args)
+        except SystemExit as error:
+            if error.code not in (None, 0):
+                report(line, error.code)
+        except Exception:
+            report(line, traceback.format_exc().rstrip())
+
+
+def report(line, error):
+    """Report a failed run on stderr"""
+
+    sys.stdout.flush()
+    sys.stderr.write('{:s}: {!s}\n'.format(line.strip(), error))
+    sys.stderr.flush()
+
+
+def serve(path, args, socket_path):
+    """Run a script for each line received on each connection to a local
+    socket, sending output back on the connection"""
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                # Some scripts write straight to the stdout file descriptor,
+                # so point that at the connection
+                sys.stdout.flush()
+                saved_stdout = os.dup(1)
+                os.dup2(conn.fileno(), 1)
+                try:
+                    with conn.makefile('r') as lines:
+                        run_lines(path, args, lines)
+                finally:
+                    sys.stdout.flush()
+                    os.dup2(saved_stdout, 1)
+                    os.close(saved_stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(socket_path)
+
+
+def send(socket_path, args):
+    """Send arguments to a worker and print its output (relative paths are
+    relative to the worker's working directory)"""
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    with client:
+        client.sendall((' '.join(shlex.quote(arg) for arg in args) +
+                        '\n').encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+        stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            stdout.write(data)
+        stdout.flush()
+
+if __name__ == '__main__':
+    main()
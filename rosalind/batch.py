@@ -0,0 +1,286 @@
+"""Run the solution to a Rosalind problem on many datasets in one process
+pool, collecting the output into one TSV or JSONL file.
+
+    python -m rosalind.batch PROBLEM [--manifest FILE] [PATTERN...]
+        [--processes N] [--format tsv|jsonl] [-- ARGS...]
+
+Datasets are listed one per line in a manifest and/or matched by glob
+patterns. The problem's script is run in a worker process for each dataset
+(parsing ARGS afresh, so file arguments are reopened) with its output
+captured. Any dataset that fails is reported (on stderr, and in JSONL output)
+without stopping the batch, even if it kills its worker process: datasets
+that were running in a pool that broke are run again one at a time in a pool
+of their own.
+
+In TSV output, each line of output is prefixed by the dataset's path and a
+tab. In JSONL output, each dataset has an object with its path ("file"), a list
+of lines of output ("output") and any error ("error").
+"""
+
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import glob
+import io
+from itertools import islice
+import json
+import os
+import sys
+
+from rosalind import instrument
+from rosalind.__main__ import SUFFIX_FOR, get_problems, get_script, run
+
+# Path of the script and its arguments in each worker process
+worker_script = None
+worker_args = None
+
+
+def main(args):
+    """Run script on each dataset"""
+
+    path = get_script(args.problem, args.backend)
+    paths = get_paths(args.manifest, args.patterns)
+
+    # Check the script accepts its arguments before starting any workers
+    check_args(path, args.script_args)
+    results = run_datasets(path, args.script_args, paths, args.processes,
+                           args.chunksize, ordered=not args.unordered)
+
+    failures = 0
+    for dataset, output, error in results:
+        if error is not None:
+            failures += 1
+            sys.stderr.write('{:s}: {:s}\n'.format(dataset, error))
+        if args.format == 'jsonl':
+            args.output.write(json.dumps({'file': dataset,
+                                          'output': output.splitlines(),
+                                          'error': error}) + '\n')
+        elif error is None:
+            for line in output.splitlines():
+                args.output.write('{:s}\t{:s}\n'.format(dataset, line))
+    args.output.flush()
+
+    if failures:
+        sys.exit('{:d} dataset(s) failed'.format(failures))
+
+
+def get_paths(manifest, patterns):
+    """Get paths of datasets listed in a manifest, then those matching each
+    glob pattern (in sorted order)"""
+
+    if manifest is not None:
+        for line in manifest:
+            if line.strip():
+                yield line.rstrip('\r\n')
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            yield path
+
+
+def check_args(path, script_args):
+    """Parse arguments with a script (exiting if it rejects them) without
+    running it"""
+
+    instrument.hook = close_files
+    try:
+        run(path, script_args + [os.devnull])
+    finally:
+        instrument.hook = None
+
+
+def close_files(main, args):
+    """Close any files opened by parsing a script's arguments"""
+
+    for value in vars(args).values():
+        if isinstance(value, io.IOBase):
+            value.close()
+
+
+def run_datasets(path, script_args, datasets, processes=1, chunksize=1,
+                 ordered=True):
+    """Run script on each dataset in a process pool, getting (dataset,
+    output, error)
+
+    Datasets are sent to processes in chunks, with only a few chunks per
+    process in flight. If the pool breaks (a worker is killed), the datasets
+    in flight that haven't finished are each run again in a pool of their
+    own, so only the dataset that killed its worker fails.
+    """
+
+    datasets = iter(datasets)
+    chunks = iter(lambda: list(islice(datasets, chunksize)), [])
+    pending = deque()
+    executor = start_pool(path, script_args, processes)
+    try:
+        while True:
+            while len(pending) < processes * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append((chunk, executor.submit(run_chunk, chunk)))
+            if not pending:
+                break
+
+            if ordered:
+                chunk, future = pending.popleft()
+            else:
+                wait([future for _, future in pending],
+                     return_when=FIRST_COMPLETED)
+                chunk, future = next(item for item in pending
+                                     if item[1].done())
+                pending.remove((chunk, future))
+
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                executor.shutdown()
+                pending.appendleft((chunk, future))
+                for chunk, future in pending:
+                    if future.done() and future.exception() is None:
+                        results = future.result()
+                    else:
+                        results = [run_alone(path, script_args, dataset)
+                                   for dataset in chunk]
+                    for result in results:
+                        yield result
+                pending.clear()
+                executor = start_pool(path, script_args, processes)
+                continue
+            except Exception as error:
+                # Fail the chunk's datasets rather than the whole batch
+                results = [(dataset, '', get_error_message(error))
+                           for dataset in chunk]
+            for result in results:
+                yield result
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def start_pool(path, script_args, processes):
+    """Start a pool of worker processes running a script"""
+
+    return ProcessPoolExecutor(processes, initializer=init_worker,
+                               initargs=(path, script_args))
+
+
+def run_alone(path, script_args, dataset):
+    """Run script on a dataset in a process of its own, getting (dataset,
+    output, error)"""
+
+    executor = start_pool(path, script_args, 1)
+    try:
+        return executor.submit(run_chunk, [dataset]).result()[0]
+    except BrokenProcessPool:
+        return dataset, '', 'worker process died'
+    except Exception as error:
+        return dataset, '', get_error_message(error)
+    finally:
+        executor.shutdown()
+
+
+def init_worker(path, script_args):
+    """Keep path of script and its arguments in a worker process"""
+
+    global worker_script, worker_args
+    worker_script, worker_args = path, script_args
+
+
+def run_chunk(datasets):
+    """Run script on each of a chunk of datasets"""
+
+    return [run_dataset(dataset) for dataset in datasets]
+
+
+def run_dataset(path):
+    """Run script on a dataset, parsing its arguments afresh, getting (path,
+    output, error)"""
+
+    def run_main(main, args):
+        try:
+            main(args)
+        finally:
+            close_files(main, args)
+
+    output = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+    errors = io.StringIO()
+    stdout, sys.stdout = sys.stdout, output
+    stderr, sys.stderr = sys.stderr, errors
+    instrument.hook = run_main
+    try:
+        try:
+            run(worker_script, worker_args + [path])
+        except SystemExit as error:
+            if error.code not in (None, 0):
+                # Report error message (e.g. from argparse) if not the exit
+                # code
+                message = errors.getvalue().strip().splitlines()
+                return path, '', message[-1] if message and \
+                    isinstance(error.code, int) else str(error.code)
+        output.flush()
+        return path, output.buffer.getvalue().decode('utf-8'), None
+    except UnicodeDecodeError:
+        return path, '', 'output is not text (binary --format?)'
+    except Exception as error:
+        return path, '', get_error_message(error)
+    finally:
+        instrument.hook = None
+        sys.stdout = stdout
+        sys.stderr = stderr
+
+
+def get_error_message(error):
+    """Get message reporting an exception"""
+
+    return '{:s}: {!s}'.format(type(error).__name__, error)
+
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+    script_args = []
+    if '--' in argv:
+        script_args = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+
+    parser = argparse.ArgumentParser(
+        prog='python -m rosalind.batch',
+        description='Run a solution on many datasets',
+        epilog='Arguments after -- are passed to the script.')
+    parser.add_argument(
+        'problem', metavar='PROBLEM', choices=get_problems(),
+        help='Problem to solve')
+    parser.add_argument(
+        'patterns', metavar='PATTERN', nargs='*',
+        help='Glob pattern matching datasets (** matches any directories)')
+    parser.add_argument(
+        '--manifest', metavar='FILE', type=argparse.FileType('r'),
+        help='File listing paths of datasets, one per line (- for stdin)')
+    parser.add_argument(
+        '--backend', choices=sorted(SUFFIX_FOR), default='pure',
+        help='Which solution to run (default: pure)')
+    parser.add_argument(
+        '--processes', metavar='N', type=int, default=1,
+        help='Number of processes (default: 1)')
+    parser.add_argument(
+        '--chunksize', metavar='N', type=int, default=16,
+        help='Number of datasets sent to a process at a time (default: 16)')
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help='Write results as they finish rather than in order of datasets')
+    parser.add_argument(
+        '--format', choices=['tsv', 'jsonl'], default='tsv',
+        help='Output format (default: tsv)')
+    parser.add_argument(
+        '--output', metavar='FILE', type=argparse.FileType('w'),
+        default=sys.stdout,
+        help='Output file (default: stdout)')
+    args = parser.parse_intermixed_args(argv)
+    args.script_args = script_args
+
+    if get_script(args.problem, args.backend) is None:
+        parser.error('no {:s} solution to problem {!r}'.format(
+            args.backend, args.problem))
+    if args.manifest is None and not args.patterns:
+        parser.error('give a manifest and/or glob patterns of datasets')
+
+    main(args)
@@ -0,0 +1,330 @@
+"""Benchmark the solutions on seeded synthetic datasets.
+
+    python -m rosalind.benchmark [--problems cons gc ...] [--lengths ...]
+        [--records ...] [--output results.json]
+
+Datasets are generated for each problem at each sequence length (and, for
+problems with many sequences, each number of records), and the solution for
+each backend run on them in a separate process, recording the fastest time
+and peak memory of several runs as JSON.
+"""
+
+import argparse
+from datetime import datetime
+from functools import partial
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from rosalind.__main__ import SUFFIX_FOR, get_problems, get_script
+
+# Bases are generated in blocks of this many lines
+BLOCK_LINES = 16384
+
+# FASTA line width
+LINE_WIDTH = 60
+
+# RNA codons other than stop codons, for prot
+SENSE_CODONS = [''.join(codon) for codon in itertools.product('UCAG', repeat=3)
+                if ''.join(codon) not in ('UAA', 'UAG', 'UGA')]
+
+
+def main(args):
+    """Benchmark solutions"""
+
+    variants = [(problem, []) for problem in args.problems]
+    for variant in args.variant:
+        problem, _, variant_args = variant.partition(':')
+        variants.append((problem, shlex.split(variant_args)))
+
+    if args.data_dir and not os.path.isdir(args.data_dir):
+        os.makedirs(args.data_dir)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='rosalind-')
+    try:
+        results = []
+        for problem, variant_args in variants:
+            for length, records in get_sizes(problem, args.lengths,
+                                             args.records):
+                dataset = get_dataset(problem, length, records, args.seed,
+                                      data_dir)
+                for backend in args.backends:
+                    path = get_script(problem, backend)
+                    if path is None:
+                        continue
+                    result = benchmark(path, variant_args, dataset,
+                                       args.repeat, args.cpu_limit)
+                    result.update(problem=problem, backend=backend,
+                                  args=variant_args, length=length,
+                                  records=records,
+                                  input_bytes=os.path.getsize(dataset))
+                    results.append(result)
+                    sys.stderr.write(
+                        '{:s} {:s} {:s} length={:d} records={:d}: {:s} '
+                        '{:.3f}s {:d} bytes\n'.format(
+                            problem, backend, ' '.join(variant_args), length,
+                            records, result['status'], result['seconds'],
+                            result['max_rss_bytes']))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir)
+
+    output = {
+        'date': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'cpu_limit': args.cpu_limit,
+        'results': results,
+    }
+    json.dump(output, args.output, indent=2, sort_keys=True)
+    args.output.write('\n')
+
+
+def get_sizes(problem, lengths, records):
+    """Get (length, records) of each dataset for a problem"""
+
+    if GENERATOR_FOR[problem][1]:
+        return list(itertools.product(lengths, records))
+    return [(length, 1) for length in lengths]
+
+
+def get_dataset(problem, length, records, seed, data_dir):
+    """Get path of a dataset, generating it unless it already exists"""
+
+    path = os.path.join(data_dir, '{:s}-{:d}-{:d}-{:d}.txt'.format(
+        problem, length, records, seed))
+    if not os.path.exists(path):
+        # Seed each dataset separately so it doesn't depend on which others
+        # are generated
+        rng = random.Random('{:d}-{:s}-{:d}-{:d}'.format(seed, problem, length,
+                                                         records))
+        with open(path + '.tmp', 'wb') as fh:
+            GENERATOR_FOR[problem][0](fh, rng, length, records)
+        os.rename(path + '.tmp', path)
+    return path
+
+
+def benchmark(path, args, dataset, repeat, cpu_limit):
+    """Run a script on a dataset several times, getting the fastest time and
+    largest peak memory"""
+
+    result = {'status': 'ok', 'seconds': None, 'max_rss_bytes': 0}
+    for _ in range(repeat):
+        seconds, usage, status = run(path, args, dataset, cpu_limit)
+        if result['seconds'] is None or seconds < result['seconds']:
+            result['seconds'] = seconds
+        result['max_rss_bytes'] = max(result['max_rss_bytes'],
+                                      get_max_rss_bytes(usage))
+        if status:
+            result['status'] = status
+            break
+    return result
+
+
+def run(path, args, dataset, cpu_limit):
+    """Run a script, getting its wall time, resource usage and a status
+    (None if it succeeded)"""
+
+    def limit_cpu():
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
+
+    with open(os.devnull, 'wb') as devnull:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, path] + args + [dataset], stdout=devnull,
+            preexec_fn=limit_cpu if cpu_limit else None)
+        _, wait_status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+    process.returncode = 0  # Already reaped
+
+    if os.WIFSIGNALED(wait_status) and \
+            os.WTERMSIG(wait_status) in (signal.SIGXCPU, signal.SIGKILL):
+        return seconds, usage, 'timeout'
+    if not os.WIFEXITED(wait_status) or os.WEXITSTATUS(wait_status):
+        return seconds, usage, 'error'
+    return seconds, usage, None
+
+
+def get_max_rss_bytes(usage):
+    """Get peak memory from resource usage (in KiB except on macOS)"""
+
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss
+    return usage.ru_maxrss * 1024
+
+
+def get_random_seq(rng, length, alphabet=b'ACGT'):
+    """Get random sequence, generating blocks of bases"""
+
+    block_size = BLOCK_LINES * LINE_WIDTH
+    return b''.join(bytes(bytearray(rng.choices(alphabet,
+                                                k=min(block_size,
+                                                      length - start))))
+                    for start in range(0, length, block_size))
+
+
+def write_fasta(fh, records):
+    """Write (id, sequence) records as FASTA"""
+
+    for id, seq in records:
+        fh.write(b'>' + id.encode('ascii') + b'\n')
+        for start in range(0, len(seq), BLOCK_LINES * LINE_WIDTH):
+            block = seq[start:start + BLOCK_LINES * LINE_WIDTH]
+            fh.write(b'\n'.join(block[i:i + LINE_WIDTH]
+                                for i in range(0, len(block), LINE_WIDTH)))
+            fh.write(b'\n')
+
+
+def get_ids(records):
+    """Get IDs in the style of Rosalind datasets"""
+
+    return ['Rosalind_{:d}'.format(i) for i in range(1, records + 1)]
+
+
+def generate_seq(fh, rng, length, records):
+    """Generate a DNA string"""
+
+    fh.write(get_random_seq(rng, length) + b'\n')
+
+
+def generate_seqs(fh, rng, length, records):
+    """Generate FASTA records of DNA strings of the same length"""
+
+    write_fasta(fh, ((id, get_random_seq(rng, length))
+                     for id in get_ids(records)))
+
+
+def generate_revp(fh, rng, length, records):
+    """Generate a DNA string in FASTA format"""
+
+    write_fasta(fh, [('Rosalind_1', get_random_seq(rng, length))])
+
+
+def generate_lcsm(fh, rng, length, records):
+    """Generate DNA strings sharing a motif"""
+
+    motif = get_random_seq(rng, min(max(length // 10, 1), 20))
+    seqs = []
+    for id in get_ids(records):
+        seq = get_random_seq(rng, length - len(motif))
+        pos = rng.randint(0, len(seq))
+        seqs.append((id, seq[:pos] + motif + seq[pos:]))
+    write_fasta(fh, seqs)
+
+
+def generate_hamm(fh, rng, length, records):
+    """Generate two DNA strings of the same length"""
+
+    fh.write(get_random_seq(rng, length) + b'\n')
+    fh.write(get_random_seq(rng, length) + b'\n')
+
+
+def generate_subs(fh, rng, length, records):
+    """Generate a DNA string and a substring of it"""
+
+    seq = get_random_seq(rng, length)
+    motif_length = min(length, 10)
+    pos = rng.randint(0, length - motif_length)
+    fh.write(seq + b'\n' + seq[pos:pos + motif_length] + b'\n')
+
+
+def generate_prot(fh, rng, length, records):
+    """Generate an mRNA string coding for a protein"""
+
+    codons = ['AUG'] + rng.choices(SENSE_CODONS, k=max(length // 3 - 2, 0)) + \
+        ['UAA']
+    fh.write(''.join(codons).encode('ascii') + b'\n')
+
+
+def generate_integers(fh, rng, length, records, count):
+    """Generate the length, then the number of records (for fib, k, and for
+    fibd, m), or the length split into three (for iprb)"""
+
+    if count == 2:
+        integers = [length, max(records, 2)]
+    else:
+        integers = [max(length // 3, 1)] * 3
+    fh.write(' '.join(str(x) for x in integers).encode('ascii') + b'\n')
+
+
+# Dataset generator for each problem and whether it uses the number of records
+GENERATOR_FOR = {
+    'cons': (generate_seqs, True),
+    'dna': (generate_seq, False),
+    'fib': (partial(generate_integers, count=2), True),
+    'fibd': (partial(generate_integers, count=2), True),
+    'gc': (generate_seqs, True),
+    'grph': (generate_seqs, True),
+    'hamm': (generate_hamm, False),
+    'iprb': (partial(generate_integers, count=3), False),
+    'lcsm': (generate_lcsm, True),
+    'prot': (generate_prot, False),
+    'revc': (generate_seq, False),
+    'revp': (generate_revp, False),
+    'rna': (generate_seq, False),
+    'subs': (generate_subs, False),
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python -m rosalind.benchmark',
+        description='Benchmark solutions on synthetic datasets')
+    parser.add_argument(
+        '--problems', metavar='PROBLEM', nargs='*',
+        choices=sorted(GENERATOR_FOR),
+        default=[problem for problem in get_problems()
+                 if problem in GENERATOR_FOR],
+        help='Problems to benchmark (default: all)')
+    parser.add_argument(
+        '--variant', metavar='PROBLEM:ARGS', action='append', default=[],
+        help='Also benchmark a problem with extra arguments, e.g. '
+        '"dna:--stream --processes 4" (can be repeated)')
+    parser.add_argument(
+        '--backends', metavar='BACKEND', nargs='+',
+        choices=sorted(SUFFIX_FOR), default=sorted(SUFFIX_FOR, reverse=True),
+        help='Backends to benchmark where available (default: pure '
+        'biopython)')
+    parser.add_argument(
+        '--lengths', metavar='N', type=int, nargs='+',
+        default=[1000, 100000],
+        help='Sequence lengths (default: 1000 100000)')
+    parser.add_argument(
+        '--records', metavar='N', type=int, nargs='+', default=[10, 1000],
+        help='Numbers of records, for problems with many sequences (default: '
+        '10 1000)')
+    parser.add_argument(
+        '--repeat', metavar='N', type=int, default=3,
+        help='Number of runs of each benchmark (default: 3)')
+    parser.add_argument(
+        '--cpu-limit', metavar='SECONDS', type=int, default=60,
+        help='Stop runs after this much CPU time, or 0 for no limit '
+        '(default: 60)')
+    parser.add_argument(
+        '--seed', metavar='N', type=int, default=0,
+        help='Seed for generating datasets (default: 0)')
+    parser.add_argument(
+        '--data-dir', metavar='DIR',
+        help='Directory to keep (and reuse) generated datasets in (default: '
+        'a temporary directory)')
+    parser.add_argument(
+        '--output', metavar='FILE', type=argparse.FileType('w'),
+        default=sys.stdout,
+        help='JSON results file (default: stdout)')
+    args = parser.parse_args()
+
+    for variant in args.variant:
+        if variant.partition(':')[0] not in GENERATOR_FOR:
+            parser.error('unknown problem in --variant {!r}'.format(variant))
+
+    main(args)
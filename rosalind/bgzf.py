@@ -0,0 +1,162 @@
+"""Reading BGZF-compressed files shared by the Python solutions.
+
+BGZF (as written by bgzip) is gzip made of independently compressed blocks of
+at most 64 KiB, each recording its own compressed and uncompressed size, so
+blocks can be found without decompressing anything and then decompressed in
+parallel (zlib releases the GIL, so threads are enough). A .gzi index maps
+compressed to uncompressed offsets of each block for random access.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+import io
+import os
+import struct
+import zlib
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Threads decompressing blocks
+THREADS = min(8, os.cpu_count() or 1)
+
+# Blocks decompressed per thread at a time when reading in order
+BATCH_BLOCKS = 4
+
+# Block offset and size in the file, start of its deflate data, and length
+# when decompressed
+Block = namedtuple('Block', ['offset', 'size', 'data_offset', 'length'])
+
+
+def is_bgzf(data):
+    """Check whether data starts with a BGZF block"""
+
+    return get_block(data, 0) is not None
+
+
+def get_block(data, offset):
+    """Get block at an offset, or None if there isn't a BGZF block there"""
+
+    # Fixed gzip header with FEXTRA flag set, then extra field length
+    if data[offset:offset + 4] != b'\x1f\x8b\x08\x04':
+        return None
+    xlen, = struct.unpack('<H', data[offset + 10:offset + 12])
+    pos = offset + 12
+    while pos + 4 <= offset + 12 + xlen:
+        subfield, length = struct.unpack('<2sH', data[pos:pos + 4])
+        if subfield == b'BC' and length == 2:
+            size = struct.unpack('<H', data[pos + 4:pos + 6])[0] + 1
+            length, = struct.unpack(
+                '<I', data[offset + size - 4:offset + size])
+            return Block(offset, size, offset + 12 + xlen, length)
+        pos += 4 + length
+    return None
+
+
+def get_blocks(data):
+    """Get every block in order"""
+
+    offset = 0
+    while offset < len(data):
+        block = get_block(data, offset)
+        if block is None:
+            raise ValueError('No BGZF block at offset {:d}'.format(offset))
+        yield block
+        offset += block.size
+
+
+def decompress_block(data, block):
+    """Decompress a block"""
+
+    deflated = data[block.data_offset:block.offset + block.size - 8]
+    return zlib.decompress(deflated, -zlib.MAX_WBITS, max(block.length, 1))
+
+
+def read_blocks(data, threads=THREADS):
+    """Decompress every block in order, a batch at a time on a thread pool"""
+
+    blocks = get_blocks(data)
+    with ThreadPoolExecutor(threads) as executor:
+        while True:
+            batch = list(islice(blocks, threads * BATCH_BLOCKS))
+            if not batch:
+                break
+            for block in executor.map(partial(decompress_block, data),
+                                      batch):
+                yield block
+
+
+def read_range(data, index, start, end, threads=THREADS):
+    """Decompress from one uncompressed offset to another using a .gzi index
+    of (compressed offset, uncompressed offset) of each block"""
+
+    if end <= start:
+        return b''
+    uncompressed = [offset for _, offset in index]
+    first = bisect_right(uncompressed, start) - 1
+    last = bisect_left(uncompressed, end) - 1
+    blocks = [get_block(data, index[i][0]) for i in range(first, last + 1)]
+    with ThreadPoolExecutor(min(threads, len(blocks))) as executor:
+        region = b''.join(executor.map(partial(decompress_block, data),
+                                       blocks))
+    return region[start - index[first][1]:end - index[first][1]]
+
+
+def build_gzi(data):
+    """Get (compressed offset, uncompressed offset) of every block"""
+
+    index = []
+    uncompressed = 0
+    for block in get_blocks(data):
+        index.append((block.offset, uncompressed))
+        uncompressed += block.length
+    return index
+
+
+def read_gzi(path):
+    """Read .gzi index (which leaves out the first block)"""
+
+    with open(path, 'rb') as fh:
+        count, = struct.unpack('<Q', fh.read(8))
+        offsets = struct.unpack('<{:d}Q'.format(count * 2),
+                                fh.read(count * 16))
+    return [(0, 0)] + list(zip(offsets[::2], offsets[1::2]))
+
+
+def write_gzi(path, index):
+    """Write .gzi index"""
+
+    entries = index[1:]
+    with open(path, 'wb') as fh:
+        fh.write(struct.pack('<Q', len(entries)))
+        for compressed, uncompressed in entries:
+            fh.write(struct.pack('<QQ', compressed, uncompressed))
+
+
+class BgzfReader(io.RawIOBase):
+    """Stream of decompressed data, decompressing blocks in parallel"""
+
+    def __init__(self, data, threads=THREADS):
+        self._blocks = read_blocks(data, threads)
+        self._block = b''
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._pos == len(self._block):
+            block = next(self._blocks, None)
+            if block is None:
+                return 0
+            self._block, self._pos = block, 0
+        size = min(len(buffer), len(self._block) - self._pos)
+        buffer[:size] = self._block[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def close(self):
+        self._blocks.close()
+        super(BgzfReader, self).close()
@@ -0,0 +1,392 @@
+"""Memory-mapped FASTA reading shared by the Python solutions.
+
+Record boundaries are found with bytes-level searches over a memory map of the
+file, so sequences held on a single line are returned as views into the map
+without being copied. A samtools-style .fai index can be built (and is reused
+if already present) so that a single record can be fetched directly.
+
+Gzip-compressed input is decompressed transparently. BGZF (bgzip) input that
+can be memory-mapped is decompressed in parallel, and records are fetched
+from it by decompressing only the blocks they span, found from a .gzi index.
+"""
+
+import gzip
+import io
+import mmap
+import os
+import re
+from collections import namedtuple
+
+# Columns of a .fai index line
+FaiEntry = namedtuple('FaiEntry',
+                      ['name', 'length', 'offset', 'linebases', 'linewidth'])
+
+# Start of gzip (and so BGZF) files
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Line ending bytes removed from multi-line sequences
+NEWLINES = b'\r\n'
+
+# Bytes of a memory-mapped file scanned at a time when building an index
+INDEX_BLOCK_SIZE = 1024 * 1024
+
+# FASTA header lines (with their line endings, if in the same chunk)
+HEADER = re.compile(br'^>.*\n?', re.MULTILINE)
+
+
+def read_fasta(file):
+    """Read FASTA file record by record"""
+
+    for id, seq in read_fasta_bytes(file):
+        yield id, str(seq, 'ascii')
+
+
+def read_fasta_bytes(file):
+    """Read FASTA file record by record, yielding sequences as bytes views"""
+
+    fasta = FastaFile(file)
+    if fasta.map is None:
+        for id, seq in read_fasta_lines(fasta.lines()):
+            yield id, seq
+        return
+
+    for id, start, end in fasta.records():
+        yield id, fasta.sequence(start, end)
+
+
+def read_fasta_lines(file):
+    """Read FASTA file line by line (for input that can't be memory-mapped)"""
+
+    id = None
+    seq = []
+    for line in file:
+        if isinstance(line, str):
+            line = line.encode('ascii')
+        line = line.rstrip()
+        if line.startswith(b'>'):
+            if id:
+                yield (id, b''.join(seq))
+            id = line[1:].decode('ascii')
+            seq = []
+        else:
+            seq.append(line)
+    if id:
+        yield (id, b''.join(seq))
+
+
+def read_chunks(stream, chunk_size):
+    """Read fixed-size chunks from a stream (cut anywhere, even mid-line)"""
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def split_headers(chunk, in_header=False):
+    """Split chunk of a FASTA file (or plain sequence) into (is header,
+    bytes) parts, given whether it starts inside a header line, getting the
+    parts and whether it ends inside a header line"""
+
+    parts = []
+    pos = 0
+    if in_header:
+        pos = chunk.find(b'\n') + 1 or len(chunk)
+        parts.append((True, chunk[:pos]))
+    if chunk.find(b'>', pos) != -1:
+        for header in HEADER.finditer(chunk, pos):
+            parts.append((False, chunk[pos:header.start()]))
+            parts.append((True, header.group()))
+            pos = header.end()
+    if pos < len(chunk):
+        parts.append((False, chunk[pos:] if pos else chunk))
+
+    in_header = bool(parts) and parts[-1][0] and \
+        not parts[-1][1].endswith(b'\n')
+    return parts, in_header
+
+
+def open_text(file):
+    """Get text stream of a file, decompressing it if compressed"""
+
+    fasta = FastaFile(file)
+    if fasta.compression is None:
+        return file
+    return io.TextIOWrapper(fasta.lines(), encoding='ascii')
+
+
+def get_index_entries(blocks):
+    """Get .fai index entries from consecutive blocks of a FASTA file,
+    tracking offsets as it goes (so it's never all in memory)"""
+
+    entries = []
+    offset = 0  # Of the start of the block
+    header = None  # Header line so far, while in one
+    record = None  # [id, length, start, first line bytes, first line bases]
+    linewidth = None  # Of the record's first line, once it's ended
+    at_line_start = True
+
+    for block in blocks:
+        pos = 0
+        size = len(block)
+        while pos < size:
+            if header is not None:
+                eol = block.find(b'\n', pos)
+                if eol == -1:
+                    header += block[pos:]
+                    break
+                header += block[pos:eol]
+                pos = eol + 1
+                at_line_start = True
+                record = [bytes(header).rstrip().decode('ascii'), 0,
+                          offset + pos, 0, 0]
+                header = linewidth = None
+                continue
+
+            if at_line_start and block[pos:pos + 1] == b'>':
+                add_index_entry(entries, record, linewidth)
+                record = None
+                header = bytearray()
+                pos += 1
+                at_line_start = False
+                continue
+
+            if record is not None and linewidth is None:
+                # Up to the end of the first line of the sequence
+                eol = block.find(b'\n', pos)
+                end = size if eol == -1 else eol + 1
+            else:
+                # Up to the next header
+                eol = block.find(b'\n>', pos)
+                end = size if eol == -1 else eol + 1
+            if record is not None:
+                bases = end - pos - block.count(b'\n', pos, end) - \
+                    block.count(b'\r', pos, end)
+                record[1] += bases
+                if linewidth is None:
+                    record[3] += end - pos
+                    record[4] += bases
+                    if block[end - 1:end] == b'\n':
+                        linewidth = record[3]
+            at_line_start = block[end - 1:end] == b'\n'
+            pos = end
+        offset += size
+
+    if header is not None:
+        record = [bytes(header).rstrip().decode('ascii'), 0, offset, 0, 0]
+        linewidth = None
+    add_index_entry(entries, record, linewidth)
+    return entries
+
+
+def add_index_entry(entries, record, linewidth):
+    """Add .fai index entry for a record whose end has been reached"""
+
+    if record is None:
+        return
+    id, length, start, _, linebases = record
+    if linewidth is None:
+        # No line ending
+        linebases = linewidth = length
+    entries.append(FaiEntry(id.split()[0] if id else id, length, start,
+                            linebases, linewidth))
+
+
+class FastaFile(object):
+    """Memory-mapped FASTA file
+
+    If the file is compressed then map is None and compression is 'gzip' or
+    'bgzf' (only detected if the file can be mapped). BGZF blocks are
+    decompressed by a number of threads (default: bgzf.THREADS).
+    """
+
+    def __init__(self, file, threads=None):
+        if isinstance(file, str):
+            file = open(file, 'rb')
+        self.file = file
+        self.path = getattr(file, 'name', None)
+        self.map = None
+        self.compression = None
+        self.threads = threads
+        self._compressed_map = None
+        self._index = None
+        self._gzi = None
+        try:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (io.UnsupportedOperation, AttributeError, ValueError, OSError):
+            # Pipes, empty files and in-memory streams can't be mapped
+            peek = getattr(getattr(file, 'buffer', file), 'peek', None)
+            if peek is not None and peek(2)[:2] == GZIP_MAGIC:
+                self.compression = 'gzip'
+            return
+
+        if self.map[:2] == GZIP_MAGIC:
+            # Imported only now, as it takes longer than reading most files
+            from rosalind import bgzf
+            self._compressed_map, self.map = self.map, None
+            if self.threads is None:
+                self.threads = bgzf.THREADS
+            self.compression = 'bgzf' if bgzf.is_bgzf(self._compressed_map) \
+                else 'gzip'
+
+    def lines(self):
+        """Get (decompressed) lines of the file, for reading it without the
+        memory map"""
+
+        stream = getattr(self.file, 'buffer', self.file)
+        if self.compression == 'bgzf':
+            from rosalind import bgzf
+            return io.BufferedReader(bgzf.BgzfReader(self._compressed_map,
+                                                     self.threads))
+        if self.compression == 'gzip':
+            # Read from the start each time (if not from a pipe)
+            if self._compressed_map is not None:
+                stream = self._compressed_map
+                stream.seek(0)
+            elif stream.seekable():
+                stream.seek(0)
+            return gzip.GzipFile(fileobj=stream)
+        return self.file
+
+    def records(self, data=None):
+        """Get (id, sequence start, sequence end) record by record, from the
+        memory map or else the given (decompressed) data"""
+
+        mm = self.map if data is None else data
+        size = len(mm)
+        if mm[:1] == b'>':
+            pos = 0
+        else:
+            pos = mm.find(b'\n>')
+            pos = size if pos == -1 else pos + 1
+        while pos < size:
+            eol = mm.find(b'\n', pos)
+            if eol == -1:
+                eol = size
+            id = mm[pos + 1:eol].rstrip().decode('ascii')
+            next_pos = mm.find(b'\n>', eol)
+            end = size if next_pos == -1 else next_pos
+            yield id, min(eol + 1, end), end
+            pos = size if next_pos == -1 else next_pos + 1
+
+    def sequence(self, start, end):
+        """Get sequence between two offsets, as a view if on a single line"""
+
+        mm = self.map
+        while end > start and mm[end - 1:end] in (b'\n', b'\r', b' ', b'\t'):
+            end -= 1
+        if mm.find(b'\n', start, end) == -1:
+            return memoryview(mm)[start:end]
+        return mm[start:end].translate(None, NEWLINES)
+
+    def index(self):
+        """Get .fai index entries by name, building the index if necessary"""
+
+        if self._index is not None:
+            return self._index
+
+        fai_path = None if self.path is None else self.path + '.fai'
+        if self._is_current(fai_path):
+            entries = read_fai(fai_path)
+        else:
+            entries = self.build_index()
+            if fai_path:
+                try:
+                    write_fai(fai_path, entries)
+                except (IOError, OSError):
+                    pass  # Index is still usable in memory
+
+        self._index = dict((entry.name, entry) for entry in entries)
+        return self._index
+
+    def gzi(self):
+        """Get .gzi index of a BGZF file, building it if necessary"""
+
+        if self._gzi is not None:
+            return self._gzi
+
+        from rosalind import bgzf
+
+        gzi_path = None if self.path is None else self.path + '.gzi'
+        if self._is_current(gzi_path):
+            self._gzi = bgzf.read_gzi(gzi_path)
+        else:
+            self._gzi = bgzf.build_gzi(self._compressed_map)
+            if gzi_path:
+                try:
+                    bgzf.write_gzi(gzi_path, self._gzi)
+                except (IOError, OSError):
+                    pass  # Index is still usable in memory
+        return self._gzi
+
+    def _is_current(self, index_path):
+        """Check whether an index exists and is newer than the file"""
+
+        return index_path is not None and os.path.exists(index_path) and \
+            os.path.getmtime(index_path) >= os.path.getmtime(self.path)
+
+    def build_index(self):
+        """Build .fai index entries by scanning the whole file"""
+
+        if self.map is None:
+            # Offsets are in the decompressed file
+            from rosalind import bgzf
+            blocks = bgzf.read_blocks(self._compressed_map, self.threads)
+        else:
+            mm = self.map
+            blocks = (mm[pos:pos + INDEX_BLOCK_SIZE]
+                      for pos in range(0, len(mm), INDEX_BLOCK_SIZE))
+        return get_index_entries(blocks)
+
+    def fetch(self, name):
+        """Get the sequence of a single record using the index"""
+
+        if self.map is None and self.compression != 'bgzf':
+            # No random access, so read records until finding it
+            for id, seq in read_fasta_lines(self.lines()):
+                if id.split()[0] == name:
+                    return seq
+            raise KeyError(name)
+
+        entry = self.index()[name]
+        if entry.linebases:
+            lines, remainder = divmod(entry.length, entry.linebases)
+        else:
+            lines, remainder = 0, 0
+        end = entry.offset + lines * entry.linewidth + remainder
+        if self.compression == 'bgzf':
+            from rosalind import bgzf
+            region = bgzf.read_range(self._compressed_map, self.gzi(),
+                                     entry.offset, end, self.threads)
+            return region.rstrip().translate(None, NEWLINES)
+        return self.sequence(entry.offset, end)
+
+    def close(self):
+        """Close memory map"""
+
+        for mm in (self.map, self._compressed_map):
+            if mm is not None:
+                try:
+                    mm.close()
+                except BufferError:
+                    pass  # Sequence views still refer to the map
+
+
+def read_fai(path):
+    """Read .fai index entries"""
+
+    entries = []
+    with open(path) as fh:
+        for line in fh:
+            fields = line.rstrip('\n').split('\t')
+            entries.append(FaiEntry(fields[0], *[int(x) for x in fields[1:5]]))
+    return entries
+
+
+def write_fai(path, entries):
+    """Write .fai index entries"""
+
+    with open(path, 'w') as fh:
+        for entry in entries:
+            fh.write('\t'.join(str(field) for field in entry) + '\n')
@@ -0,0 +1,256 @@
+"""Optional timing of the parse, compute and emit stages of a script.
+
+Enabled with --profile (see add_arguments) or by setting the ROSALIND_PROFILE
+environment variable, in which case a table of the time, records and bytes of
+each stage and the peak memory is written to stderr when the script finishes.
+Time spent getting records from iterate (or reading with read) counts as parse,
+writing to stdout as emit and the rest of main as compute.
+
+--profile-dump (or ROSALIND_PROFILE=cprofile or tracemalloc) also dumps
+cProfile statistics or a tracemalloc snapshot to --profile-output.
+
+When disabled, stage, iterate and read do nothing but return their input (or
+a shared no-op context manager) and stdout isn't wrapped.
+"""
+
+from contextlib import contextmanager
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ENV_VAR = 'ROSALIND_PROFILE'
+
+# Dumps, with the default extension of each
+EXTENSION_FOR = {'cprofile': '.prof', 'tracemalloc': '.tracemalloc'}
+
+# Profile of the running script, or None if disabled
+current = None
+
+# Function run calls with main and args instead (e.g. to run main for many
+# datasets in a batch), or None
+hook = None
+
+
+class Profile(object):
+    """Exclusive time, records and bytes for each stage"""
+
+    def __init__(self):
+        self.seconds = {}
+        self.records = {}
+        self.bytes = {}
+        self._stack = []
+        self._start = self._started = time.perf_counter()
+
+    def push(self, name):
+        """Start a stage, pausing the current one"""
+
+        self._charge()
+        self._stack.append(name)
+
+    def pop(self):
+        """End the current stage, resuming the one before"""
+
+        self._charge()
+        self._stack.pop()
+
+    def _charge(self):
+        """Add time since last push or pop to the current stage"""
+
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self.seconds[name] = self.seconds.get(name, 0) + now - self._start
+        self._start = now
+
+    def count(self, name, records, size):
+        """Count records and bytes for a stage"""
+
+        self.records[name] = self.records.get(name, 0) + records
+        self.bytes[name] = self.bytes.get(name, 0) + size
+
+    def report(self, file, traced_peak=None):
+        """Write table of stages and peak memory"""
+
+        file.write('{:<12s}{:>12s}{:>12s}{:>16s}\n'.format(
+            'stage', 'seconds', 'records', 'bytes'))
+        for name in ['parse', 'compute', 'emit'] + sorted(
+                set(self.seconds) - set(['parse', 'compute', 'emit'])):
+            if name in self.seconds:
+                file.write('{:<12s}{:>12.6f}{:>12d}{:>16d}\n'.format(
+                    name, self.seconds[name], self.records.get(name, 0),
+                    self.bytes.get(name, 0)))
+        file.write('{:<12s}{:>12.6f}\n'.format(
+            'total', time.perf_counter() - self._started))
+        if resource is not None:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != 'darwin':
+                max_rss *= 1024  # KiB
+            file.write('peak memory {:d} bytes\n'.format(max_rss))
+        if traced_peak is not None:
+            file.write('peak traced memory {:d} bytes\n'.format(traced_peak))
+
+
+class Output(object):
+    """Stream counting writes as the emit stage"""
+
+    def __init__(self, profile, stream):
+        self._profile = profile
+        self._stream = stream
+        if hasattr(stream, 'buffer'):
+            self.buffer = Output(profile, stream.buffer)
+
+    def write(self, data):
+        self._profile.push('emit')
+        try:
+            return self._stream.write(data)
+        finally:
+            self._profile.pop()
+            self._profile.count('emit', data.count('\n' if isinstance(
+                data, str) else b'\n'), len(data))
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def add_arguments(parser):
+    """Add profiling options to an argument parser"""
+
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Report time, records and bytes of each stage and peak memory '
+        'on stderr (also enabled by setting ${:s})'.format(ENV_VAR))
+    parser.add_argument(
+        '--profile-dump', choices=sorted(EXTENSION_FOR),
+        help='Also dump cProfile statistics or a tracemalloc snapshot '
+        '(implies --profile)')
+    parser.add_argument(
+        '--profile-output', metavar='FILE',
+        help='File for --profile-dump (default: script name with .prof or '
+        '.tracemalloc extension)')
+
+
+def run(main, args):
+    """Run main, profiling it if enabled by args or the environment"""
+
+    global current
+
+    if hook is not None:
+        return hook(main, args)
+
+    setting = os.environ.get(ENV_VAR, '')
+    dump = getattr(args, 'profile_dump', None) or \
+        (setting if setting in EXTENSION_FOR else None)
+    if not getattr(args, 'profile', False) and setting in ('', '0') and \
+            not dump:
+        return main(args)
+
+    path = getattr(args, 'profile_output', None)
+    if dump and not path:
+        path = os.path.splitext(os.path.basename(sys.argv[0]))[0] + \
+            EXTENSION_FOR[dump]
+
+    current = profile = Profile()
+    stdout = sys.stdout
+    sys.stdout = Output(profile, stdout)
+    if dump == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif dump == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start()
+
+    try:
+        with _stage(profile, 'compute'):
+            main(args)
+        with _stage(profile, 'emit'):
+            sys.stdout.flush()
+    finally:
+        sys.stdout = stdout
+        current = None
+        traced_peak = None
+        if dump == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(path)
+        elif dump == 'tracemalloc':
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.take_snapshot().dump(path)
+            tracemalloc.stop()
+        profile.report(sys.stderr, traced_peak)
+
+
+@contextmanager
+def _stage(profile, name):
+    """Time a stage of a profile"""
+
+    profile.push(name)
+    try:
+        yield
+    finally:
+        profile.pop()
+
+
+class NoStage(object):
+    """Context manager doing nothing, for when profiling is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_STAGE = NoStage()
+
+
+def stage(name):
+    """Get context manager timing a stage, if profiling"""
+
+    if current is None:
+        return NO_STAGE
+    return _stage(current, name)
+
+
+def iterate(name, iterable):
+    """Time getting each item from an iterable as a stage and count items and
+    their size (of the last element of tuples), if profiling"""
+
+    if current is None:
+        return iterable
+    return _iterate(current, name, iterable)
+
+
+def _iterate(profile, name, iterable):
+    """Time getting each item from an iterable as a stage"""
+
+    iterator = iter(iterable)
+    while True:
+        profile.push(name)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            profile.pop()
+        try:
+            size = len(item[-1] if isinstance(item, tuple) else item)
+        except TypeError:
+            size = 0
+        profile.count(name, 1, size)
+        yield item
+
+
+def read(file):
+    """Read all of a file, timing it as the parse stage if profiling"""
+
+    if current is None:
+        return file.read()
+    with _stage(current, 'parse'):
+        data = file.read()
+    current.count('parse', 1, len(data))
+    return data
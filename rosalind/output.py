@@ -0,0 +1,162 @@
+"""Buffered output of many results shared by the Python solutions.
+
+Rows of fields are formatted and written in large batches rather than printed
+one at a time, as plain text (fields separated by spaces), TSV, or for rows of
+integers (e.g. positions, or edges as pairs of record numbers) a NumPy .npy
+file of 64-bit integers, which can be loaded without parsing.
+"""
+
+from array import array
+from itertools import islice
+import sys
+
+FORMATS = ('text', 'tsv', 'npy')
+
+# Rows (or fields of one long row) formatted per write
+BATCH_SIZE = 65536
+
+# Length of .npy header (magic, version, header length and dictionary),
+# padded so the shape can be filled in once all rows are written
+NPY_HEADER_LENGTH = 128
+
+
+def add_arguments(parser, npy_help):
+    """Add output format options to an argument parser"""
+
+    parser.add_argument(
+        '--format', choices=FORMATS, default='text',
+        help='Output format: text, TSV or .npy array of ' + npy_help +
+        ' (default: text)')
+    parser.add_argument(
+        '--output', metavar='FILE',
+        help='Output file (default: stdout)')
+
+
+class Writer(object):
+    """Writer of rows of fields in batches, to a file, path or stdout
+
+    For .npy output, the number of columns of integers is given (or None if
+    each row is a single integer).
+    """
+
+    def __init__(self, file=None, format='text', columns=None):
+        if format not in FORMATS:
+            raise ValueError('Unknown output format {!r}'.format(format))
+        self._close_file = isinstance(file, str)
+        if self._close_file:
+            file = open(file, 'wb' if format == 'npy' else 'w')
+        elif file is None:
+            file = sys.stdout
+        if format == 'npy' and hasattr(file, 'buffer'):
+            file.flush()
+            file = file.buffer
+        self.file = file
+        self.format = format
+        self.columns = columns
+        self.rows = 0
+        self._separator = '\t' if format == 'tsv' else ' '
+        self._values = array('q')
+        self._header_pos = None
+
+        if format == 'npy':
+            # Write a header now if the file is seekable, then fill in the
+            # shape later, rather than holding every row in memory
+            try:
+                self._header_pos = file.tell()
+                file.write(get_npy_header(0, columns))
+            except (AttributeError, IOError, OSError, ValueError):
+                self._header_pos = None
+
+    def write(self, *fields):
+        """Write a row"""
+
+        self.write_rows([fields])
+
+    def write_rows(self, rows):
+        """Write many rows"""
+
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            self.rows += len(batch)
+            if self.format == 'npy':
+                for row in batch:
+                    self._values.extend(row)
+                self._spill()
+            else:
+                separator = self._separator
+                self.file.write(''.join([
+                    separator.join([str(field) for field in row]) + '\n'
+                    for row in batch]))
+
+    def write_row(self, fields, label=None):
+        """Write one row of any number of fields a batch at a time (for .npy,
+        as many rows of one field), after a label and a tab if given (text
+        and TSV only)"""
+
+        fields = iter(fields)
+        if self.format == 'npy':
+            self.write_rows((field,) for field in fields)
+            return
+
+        self.rows += 1
+        if label is not None:
+            self.file.write(str(label) + '\t')
+        separator = ''
+        while True:
+            batch = list(islice(fields, BATCH_SIZE))
+            if not batch:
+                break
+            self.file.write(separator + self._separator.join(
+                [str(field) for field in batch]))
+            separator = self._separator
+        self.file.write('\n')
+
+    def _spill(self):
+        """Write integers held for .npy output, if the header is written"""
+
+        if self._header_pos is not None and \
+                len(self._values) >= BATCH_SIZE:
+            self.file.write(self._values.tobytes())
+            self._values = array('q')
+
+    def close(self):
+        """Finish writing (filling in .npy header) and flush, closing the
+        file if opened from a path"""
+
+        if self.format == 'npy':
+            if self._header_pos is None:
+                self.file.write(get_npy_header(self.rows, self.columns))
+                self.file.write(self._values.tobytes())
+            else:
+                self.file.write(self._values.tobytes())
+                end = self.file.tell()
+                self.file.seek(self._header_pos)
+                self.file.write(get_npy_header(self.rows, self.columns))
+                self.file.seek(end)
+            self._values = array('q')
+        if self._close_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_npy_header(rows, columns):
+    """Get .npy header for rows (of a number of columns, if not None) of
+    64-bit integers"""
+
+    shape = (rows,) if columns is None else (rows, columns)
+    byte_order = '<' if sys.byteorder == 'little' else '>'
+    header = repr({'descr': byte_order + 'i8', 'fortran_order': False,
+                   'shape': shape})
+    header = header.ljust(NPY_HEADER_LENGTH - 10 - 1) + '\n'
+    return b'\x93NUMPY\x01\x00' + \
+        (len(header)).to_bytes(2, 'little') + header.encode('latin1')
@@ -0,0 +1,309 @@
+"""Compact 2-bit packed sequences shared by the Python solutions.
+
+Bases are packed four to a byte (first base in the most significant bits), so
+a sequence takes a quarter of the memory of a str. Any other symbol (e.g. N or
+another IUPAC code) is stored as a placeholder base plus an entry in a list of
+exception runs.
+"""
+
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bases packed or unpacked at a time when reading or writing (a multiple of
+# 4, so chunks start at byte boundaries)
+CHUNK_SIZE = 1024 * 1024
+
+# Bases in code order, chosen so that complementing a code is XOR with 3
+DNA_BASES = b'ACGT'
+RNA_BASES = b'ACGU'
+
+# Complements of all IUPAC symbols, for exceptions
+COMPLEMENT = dict(zip(b'ACGTURYSWKMBDHVNacgturyswkmbdhvn',
+                      b'TGCAAYRSWMKVHDBNtgcaayrswmkvhdbn'))
+
+
+def _get_tables(bases):
+    """Get tables for converting symbols to codes and finding exceptions"""
+
+    code_for = bytearray(256)
+    for code, base in enumerate(bytearray(bases)):
+        code_for[base] = code
+    exception = re.compile(b'([^' + bases + b'])\\1*')
+    return bytes(code_for), exception
+
+
+CODE_FOR = {False: _get_tables(DNA_BASES), True: _get_tables(RNA_BASES)}
+
+# Bytes with each 2-bit code reversed and complemented
+REVCOMP_BYTE = bytes(bytearray(
+    sum(((byte >> (2 * i) & 3) ^ 3) << (2 * (3 - i)) for i in range(4))
+    for byte in range(256)))
+
+# Number of each code in each byte, for counting with bytes.translate
+CODE_COUNTS = [bytes(bytearray(
+    sum(1 for i in range(4) if byte >> (2 * i) & 3 == code)
+    for byte in range(256))) for code in range(4)]
+
+
+class PackedSeq(object):
+    """DNA or RNA sequence packed into 2 bits per base"""
+
+    __slots__ = ('_data', '_length', '_exceptions', '_rna')
+
+    def __init__(self, seq=b'', rna=None):
+        if isinstance(seq, str):
+            seq = seq.encode('ascii')
+        seq = bytes(seq)
+        if rna is None:
+            rna = b'U' in seq and b'T' not in seq
+        code_for, exception = CODE_FOR[rna]
+
+        self._rna = rna
+        self._length = len(seq)
+        self._exceptions = [(match.start(), match.end(),
+                             match.group(1).decode('ascii'))
+                            for match in exception.finditer(seq)]
+        self._data = _pack(seq.translate(code_for))
+
+    @classmethod
+    def from_chunks(cls, chunks, rna=False):
+        """Make packed sequence from chunks of bytes (e.g. read from a file),
+        packing a chunk at a time and ignoring trailing whitespace"""
+
+        code_for, exception = CODE_FOR[rna]
+        data = bytearray()
+        exceptions = []
+        length = 0
+        codes = b''  # Codes not yet filling a byte
+        trailing = b''  # Whitespace that may be at the end
+        for chunk in chunks:
+            chunk = trailing + chunk
+            seq = chunk.rstrip()
+            trailing = chunk[len(seq):]
+            for match in exception.finditer(seq):
+                start = match.start() + length
+                symbol = match.group(1).decode('ascii')
+                if exceptions and exceptions[-1][1] == start and \
+                        exceptions[-1][2] == symbol:
+                    # Run continues from the previous chunk
+                    start = exceptions.pop()[0]
+                exceptions.append((start, match.end() + length, symbol))
+            codes += seq.translate(code_for)
+            end = len(codes) - len(codes) % 4
+            data += _pack(codes[:end])
+            codes = codes[end:]
+            length += len(seq)
+        data += _pack(codes)
+
+        return cls._from_parts(bytes(data), length, exceptions, rna)
+
+    @classmethod
+    def _from_parts(cls, data, length, exceptions, rna):
+        """Make packed sequence directly from its parts"""
+
+        packed = cls.__new__(cls)
+        packed._data = data
+        packed._length = length
+        packed._exceptions = exceptions
+        packed._rna = rna
+        return packed
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return bytes(self).decode('ascii')
+
+    def __repr__(self):
+        return 'PackedSeq({!r})'.format(str(self))
+
+    def __bytes__(self):
+        return b''.join(self.chunks())
+
+    def chunks(self):
+        """Get unpacked sequence as bytes a chunk at a time"""
+
+        bases = RNA_BASES if self._rna else DNA_BASES
+        table = bytes.maketrans(b'\x00\x01\x02\x03', bases)
+        exceptions = self._exceptions
+        i = 0
+        for start in range(0, self._length, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, self._length)
+            seq = bytearray(_unpack(self._data[start // 4:(end + 3) // 4],
+                                    end - start).translate(table))
+            while i < len(exceptions) and exceptions[i][0] < end:
+                run_start, run_end, symbol = exceptions[i]
+                run_start = max(run_start, start)
+                seq[run_start - start:min(run_end, end) - start] = \
+                    symbol.encode('ascii') * (min(run_end, end) - run_start)
+                if run_end > end:
+                    break  # Run continues into the next chunk
+                i += 1
+            yield bytes(seq)
+
+    def write(self, file):
+        """Write unpacked sequence to a binary file a chunk at a time"""
+
+        for chunk in self.chunks():
+            file.write(chunk)
+
+    def __eq__(self, other):
+        return isinstance(other, PackedSeq) and bytes(self) == bytes(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(bytes(self))
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key < 0:
+                key += self._length
+            if not 0 <= key < self._length:
+                raise IndexError('PackedSeq index out of range')
+            return str(self[key:key + 1])
+
+        start, stop, step = key.indices(self._length)
+        if step != 1:
+            raise ValueError('PackedSeq slices must have a step of 1')
+        length = max(0, stop - start)
+        exceptions = [(max(run_start, start) - start,
+                       min(run_end, stop) - start, symbol)
+                      for run_start, run_end, symbol in self._exceptions
+                      if run_start < stop and run_end > start]
+        return self._from_parts(_slice(self._data, start, length), length,
+                                exceptions, self._rna)
+
+    def count(self, symbol):
+        """Count occurrences of a symbol"""
+
+        bases = RNA_BASES if self._rna else DNA_BASES
+        exceptional = sum(end - start
+                          for start, end, exception in self._exceptions
+                          if exception == symbol)
+        if symbol.encode('ascii') not in bases or len(symbol) != 1:
+            return exceptional
+
+        code = bases.index(symbol.encode('ascii'))
+        count = sum(bytearray(self._data.translate(CODE_COUNTS[code])))
+        if code == 0:
+            # Padding and exceptions are stored as code 0
+            count -= len(self._data) * 4 - self._length
+            count -= sum(end - start for start, end, _ in self._exceptions)
+        return count
+
+    def reverse_complement(self):
+        """Get reverse complement"""
+
+        data = self._data[::-1].translate(REVCOMP_BYTE)
+        padding = len(data) * 4 - self._length
+        if padding:
+            # Padding is now at the start, so shift it off
+            data = _slice(data, padding, self._length)
+        exceptions = [(self._length - end, self._length - start,
+                       symbol.translate(COMPLEMENT))
+                      for start, end, symbol in reversed(self._exceptions)]
+        return self._from_parts(data, self._length, exceptions, self._rna)
+
+    def transcribe(self):
+        """Get RNA transcribed from DNA (T becomes U, leaving exceptions
+        unchanged)"""
+
+        return self._from_parts(self._data, self._length,
+                                list(self._exceptions), True)
+
+    def hamming(self, other):
+        """Get Hamming distance to a sequence of equal length"""
+
+        if self._length != len(other):
+            raise ValueError('Sequences must be the same length')
+        if not isinstance(other, PackedSeq):
+            other = PackedSeq(other, self._rna)
+
+        # Count 2-bit codes that differ
+        diff = int.from_bytes(self._data, 'big') ^ \
+            int.from_bytes(other._data, 'big')
+        diff = (diff | diff >> 1) & int('55' * len(self._data) or '0', 16)
+        distance = bin(diff).count('1')
+
+        # Correct positions where either sequence has an exception or the
+        # sequences differ in using T or U
+        positions = set()
+        for start, end, _ in self._exceptions + other._exceptions:
+            positions.update(range(start, end))
+        if self._rna != other._rna:
+            positions.update(_get_positions(self, 3))
+        for pos in positions:
+            if self[pos] != other[pos]:
+                distance += 1
+            if _get_code(self._data, pos) != _get_code(other._data, pos):
+                distance -= 1
+
+        return distance
+
+
+def _pack(codes):
+    """Pack bytes of 2-bit codes four to a byte"""
+
+    codes += b'\x00' * (-len(codes) % 4)
+    if np is not None:
+        codes = np.frombuffer(codes, dtype=np.uint8).reshape(-1, 4)
+        return ((codes[:, 0] << 6) | (codes[:, 1] << 4) |
+                (codes[:, 2] << 2) | codes[:, 3]).astype(np.uint8).tobytes()
+
+    codes = iter(bytearray(codes))
+    return bytes(bytearray(code1 << 6 | code2 << 4 | code3 << 2 | code4
+                           for code1, code2, code3, code4
+                           in zip(codes, codes, codes, codes)))
+
+
+def _unpack(data, length):
+    """Unpack bytes of 2-bit codes"""
+
+    if np is not None:
+        data = np.frombuffer(data, dtype=np.uint8)
+        codes = np.stack([data >> 6, data >> 4 & 3, data >> 2 & 3, data & 3],
+                         axis=1)
+        return codes.astype(np.uint8).tobytes()[:length]
+
+    return b''.join(UNPACKED[byte] for byte in bytearray(data))[:length]
+
+
+# Four codes in each byte
+UNPACKED = [bytes(bytearray([byte >> 6, byte >> 4 & 3, byte >> 2 & 3,
+                             byte & 3])) for byte in range(256)]
+
+
+def _slice(data, start, length):
+    """Get packed codes from start for length codes"""
+
+    if not length:
+        return b''
+    first = start // 4
+    last = (start + length - 1) // 4
+    value = int.from_bytes(data[first:last + 1], 'big')
+    bits = (last + 1 - first) * 8
+    offset = start % 4
+    value &= (1 << (bits - 2 * offset)) - 1
+    value >>= bits - 2 * offset - 2 * length
+    value <<= 2 * (-length % 4)
+    return value.to_bytes((length + 3) // 4, 'big')
+
+
+def _get_code(data, pos):
+    """Get 2-bit code at position"""
+
+    return data[pos // 4] >> (2 * (3 - pos % 4)) & 3
+
+
+def _get_positions(packed, code):
+    """Get positions with a code (ignoring exceptions)"""
+
+    codes = _unpack(packed._data, len(packed))
+    return [pos for pos, pos_code in enumerate(bytearray(codes))
+            if pos_code == code]
@@ -0,0 +1,34 @@
+"""Process pool helpers shared by the Python solutions"""
+
+from itertools import islice
+import multiprocessing
+
+
+def imap(func, items, processes=1, chunksize=1, ordered=True,
+         initializer=None, initargs=()):
+    """Map function over items using a process pool
+
+    Unlike Pool.imap, items are taken from the iterable a batch at a time, so
+    only a few chunks per process are ever held in memory.
+    """
+
+    if processes == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield func(item)
+        return
+
+    pool = multiprocessing.Pool(processes, initializer, initargs)
+    pool_imap = pool.imap if ordered else pool.imap_unordered
+    items = iter(items)
+    try:
+        while True:
+            batch = list(islice(items, processes * chunksize * 2))
+            if not batch:
+                break
+            for result in pool_imap(func, batch, chunksize):
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
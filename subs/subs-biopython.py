@@ -5,26 +5,46 @@ kbp)" and returns "All locations of t as a substring of s".
 """
 
 import argparse
-from Bio import pairwise2
+import os
+import sys
+from Bio.SeqUtils import nt_search
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument  # noqa: E402
 
 
 def main(args):
     """Finding a Motif in DNA"""
 
-    (s, t) = [line.rstrip() for line in args.dataset]
-
-    # Do local alignment with identical bases scoring 1 (otherwise 0) and gap
-    # opening and extending penalties of -1
-    # e.g. ('GATATATGCATATACTT', '---------ATAT----', 4.0, 9, 13)
-    locations = [align[3] + 1
-                 for align in pairwise2.align.localxs(s, t, -1, -1)]
-    print(' '.join(str(location) for location in sorted(locations)))
+    lines = [line.rstrip()
+             for line in instrument.iterate('parse', args.dataset)]
+    if args.motifs:
+        s = lines[0]
+        motifs = [line.rstrip() for line in args.motifs if line.strip()]
+    else:
+        (s, t) = lines
+        motifs = [t]
+
+    # Exact (overlapping) matches, rather than a full local alignment
+    # e.g. ['ATAT', 1, 3, 9]
+    for motif in motifs:
+        locations = [location + 1 for location in nt_search(s, motif)[1:]]
+        output = ' '.join(str(location) for location in locations)
+        if args.motifs:
+            print('{:s}\t{:s}'.format(motif, output))
+        else:
+            print(output)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Finding a Motif in DNA')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='Two DNA strings s and t (each of length at most 1 kbp)')
+    parser.add_argument(
+        '--motifs', metavar='FILE', type=argparse.FileType('r'),
+        help='File of motifs (one per line) to find in s instead of t')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)
@@ -5,14 +5,79 @@ kbp)" and returns "All locations of t as a substring of s".
 """
 
 import argparse
+from array import array
+from collections import deque
+import hashlib
+import os
+import struct
+import sys
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rosalind import instrument, output  # noqa: E402
+
+# Distance between rows with stored occurrence counts in FM-index
+OCC_INTERVAL = 64
+
+# Distance between text positions with stored suffix array entries
+SA_INTERVAL = 32
+
+# Start of a saved FM-index and version of its layout
+INDEX_MAGIC = b'FMIDX'
+INDEX_VERSION = 1
+
+# Header after the magic: version, text length, SHA-1 digest of the text,
+# occurrence and suffix array intervals, and numbers of symbols and samples
+INDEX_HEADER = struct.Struct('<IQ20sIIIQ')
 
 
 def main(args):
     """Finding a Motif in DNA"""
 
-    (s, t) = [line.rstrip() for line in args.dataset]
+    lines = [line.rstrip()
+             for line in instrument.iterate('parse', args.dataset)]
+    if args.motifs:
+        s = lines[0]
+        motifs = [line.rstrip() for line in args.motifs if line.strip()]
+    else:
+        (s, t) = lines
+        motifs = [t]
+
+    if args.aho_corasick:
+        locations = get_locations_aho_corasick(s, motifs)
+    elif args.index:
+        index = None
+        if os.path.exists(args.index):
+            try:
+                index = FMIndex.load(args.index)
+            except ValueError as error:
+                sys.exit('{:s}: {!s} (remove it to rebuild it)'.format(
+                    args.index, error))
+            if not index.is_index_of(s):
+                index = None  # Stale, so rebuild it
+        if index is None:
+            index = FMIndex(s)
+            index.save(args.index)
+        locations = dict((motif, index.locate(motif)) for motif in motifs)
+    else:
+        locations = dict((motif, list(get_location(s, motif)))
+                         for motif in motifs)
 
-    print(' '.join(str(location) for location in get_location(s, t)))
+    columns = 2 if args.motifs else None
+    with output.Writer(args.output, args.format, columns) as writer:
+        for i, motif in enumerate(motifs):
+            if args.format == 'text':
+                # All locations of a motif on one line
+                writer.write_row(locations[motif],
+                                 motif if args.motifs else None)
+            elif args.motifs:
+                # One row per location, after the motif (or its number)
+                label = i if args.format == 'npy' else motif
+                writer.write_rows((label, location)
+                                  for location in locations[motif])
+            else:
+                writer.write_rows((location,)
+                                  for location in locations[motif])
 
 
 def get_location(string, substring):
@@ -26,11 +91,247 @@ def get_location(string, substring):
     except ValueError:
         pass
 
+
+def get_locations_aho_corasick(string, substrings):
+    """Get locations of many substrings in one pass over string"""
+
+    # Build trie of substrings
+    goto = [{}]
+    matches = [[]]
+    for substring in substrings:
+        state = 0
+        for char in substring:
+            if char not in goto[state]:
+                goto.append({})
+                matches.append([])
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        if substring not in matches[state]:
+            matches[state].append(substring)
+
+    # Add failure links breadth first, so each state also reports the matches
+    # of the longest proper suffix that is in the trie
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            queue.append(next_state)
+            fallback = fail[state]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[next_state] = goto[fallback].get(char, 0)
+            matches[next_state] = matches[next_state] + \
+                matches[fail[next_state]]
+
+    locations = dict((substring, []) for substring in substrings)
+    state = 0
+    for pos, char in enumerate(string):
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for substring in matches[state]:
+            locations[substring].append(pos - len(substring) + 2)
+
+    return locations
+
+
+class FMIndex(object):
+    """FM-index (BWT plus sampled suffix array) of a string"""
+
+    def __init__(self, string=None):
+        if string is None:
+            return
+
+        text = string.encode('ascii') + b'$'
+        self.length = len(string)
+        self.digest = get_digest(string)
+        suffix_array = get_suffix_array(text)
+        self.bwt = bytes(bytearray(text[pos - 1] for pos in suffix_array))
+
+        # Count of symbols smaller than each symbol
+        self.smaller = {}
+        total = 0
+        for symbol in sorted(set(self.bwt)):
+            self.smaller[symbol] = total
+            total += self.bwt.count(symbol)
+
+        # Occurrences of each symbol before every OCC_INTERVAL-th row
+        self.occ = dict((symbol, [0]) for symbol in self.smaller)
+        for end in range(OCC_INTERVAL, len(self.bwt) + 1, OCC_INTERVAL):
+            for symbol, counts in self.occ.items():
+                counts.append(counts[-1] + self.bwt.count(
+                    symbol, end - OCC_INTERVAL, end))
+
+        # Suffix array rows for every SA_INTERVAL-th text position
+        self.sampled = dict((row, pos) for row, pos in enumerate(suffix_array)
+                            if pos % SA_INTERVAL == 0)
+
+    @classmethod
+    def load(cls, path):
+        """Load index saved with save, raising ValueError if the file isn't
+        one (or is from another version)"""
+
+        index = cls()
+        with open(path, 'rb') as fh:
+            if fh.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError('not an FM-index')
+            header = fh.read(INDEX_HEADER.size)
+            if len(header) != INDEX_HEADER.size:
+                raise ValueError('truncated FM-index')
+            (version, index.length, index.digest, occ_interval, sa_interval,
+             symbols, samples) = INDEX_HEADER.unpack(header)
+            if version != INDEX_VERSION or occ_interval != OCC_INTERVAL or \
+                    sa_interval != SA_INTERVAL:
+                raise ValueError('FM-index from another version')
+
+            try:
+                index.bwt = fh.read(index.length + 1)
+                if len(index.bwt) != index.length + 1:
+                    raise EOFError
+                checkpoints = len(index.bwt) // OCC_INTERVAL + 1
+                index.occ = {}
+                for symbol in bytearray(fh.read(symbols)):
+                    index.occ[symbol] = read_array(fh, checkpoints)
+                rows = read_array(fh, samples)
+                positions = read_array(fh, samples)
+            except EOFError:
+                raise ValueError('truncated FM-index')
+
+        index.smaller = {}
+        total = 0
+        for symbol in sorted(index.occ):
+            index.smaller[symbol] = total
+            total += index.bwt.count(symbol)
+        index.sampled = dict(zip(rows, positions))
+        return index
+
+    def save(self, path):
+        """Save index as the BWT and arrays of occurrence counts and suffix
+        array samples (rather than pickled, so loading runs no code)"""
+
+        symbols = sorted(self.occ)
+        rows = array('q', self.sampled)
+        positions = array('q', [self.sampled[row] for row in rows])
+        with open(path, 'wb') as fh:
+            fh.write(INDEX_MAGIC)
+            fh.write(INDEX_HEADER.pack(
+                INDEX_VERSION, self.length, self.digest, OCC_INTERVAL,
+                SA_INTERVAL, len(symbols), len(rows)))
+            fh.write(self.bwt)
+            fh.write(bytes(bytearray(symbols)))
+            for symbol in symbols:
+                write_array(fh, array('q', self.occ[symbol]))
+            write_array(fh, rows)
+            write_array(fh, positions)
+
+    def is_index_of(self, string):
+        """Check whether the index was built from a string"""
+
+        return self.length == len(string) and \
+            self.digest == get_digest(string)
+
+    def count_before(self, symbol, row):
+        """Count occurrences of symbol in BWT before row"""
+
+        checkpoint = row // OCC_INTERVAL
+        return self.occ[symbol][checkpoint] + self.bwt.count(
+            symbol, checkpoint * OCC_INTERVAL, row)
+
+    def locate(self, pattern):
+        """Get sorted (1-based) locations of pattern"""
+
+        first, last = 0, len(self.bwt)
+        for symbol in reversed(bytearray(pattern.encode('ascii'))):
+            if symbol not in self.smaller:
+                return []
+            first = self.smaller[symbol] + self.count_before(symbol, first)
+            last = self.smaller[symbol] + self.count_before(symbol, last)
+            if first >= last:
+                return []
+
+        return sorted(self.position(row) + 1 for row in range(first, last))
+
+    def position(self, row):
+        """Get text position of suffix array row by walking back through the
+        BWT to a sampled row"""
+
+        steps = 0
+        while row not in self.sampled:
+            symbol = self.bwt[row]
+            row = self.smaller[symbol] + self.count_before(symbol, row)
+            steps += 1
+        return self.sampled[row] + steps
+
+
+def get_digest(string):
+    """Get hash of a string indexed"""
+
+    return hashlib.sha1(string.encode('ascii')).digest()
+
+
+def read_array(fh, length):
+    """Read array of 64-bit integers (little-endian) from a file"""
+
+    values = array('q')
+    values.fromfile(fh, length)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def write_array(fh, values):
+    """Write array of 64-bit integers (little-endian) to a file"""
+
+    if sys.byteorder == 'big':
+        values = array('q', values)
+        values.byteswap()
+    values.tofile(fh)
+
+
+def get_suffix_array(text):
+    """Get suffix array of text (ending with a unique smallest symbol) by
+    prefix doubling"""
+
+    length = len(text)
+    rank = list(bytearray(text))
+    suffix_array = list(range(length))
+    offset = 1
+    while True:
+        # Ranks start as byte values, so may be more than the length
+        base = max(rank) + 2
+
+        def key(pos):
+            return (rank[pos] * base +
+                    (rank[pos + offset] + 1 if pos + offset < length else 0))
+        suffix_array.sort(key=key)
+        new_rank = [0] * length
+        for i in range(1, length):
+            new_rank[suffix_array[i]] = new_rank[suffix_array[i - 1]] + \
+                (key(suffix_array[i]) != key(suffix_array[i - 1]))
+        rank = new_rank
+        if rank[suffix_array[-1]] == length - 1:
+            return suffix_array
+        offset *= 2
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Finding a Motif in DNA')
     parser.add_argument(
         'dataset', metavar='FILE', type=argparse.FileType('r'),
         help='Two DNA strings s and t (each of length at most 1 kbp)')
+    parser.add_argument(
+        '--motifs', metavar='FILE', type=argparse.FileType('r'),
+        help='File of motifs (one per line) to find in s instead of t')
+    parser.add_argument(
+        '--index', metavar='FILE',
+        help='FM-index of s to search (built and saved if it does not exist)')
+    parser.add_argument(
+        '--aho-corasick', action='store_true',
+        help='Find all motifs in one pass over s (without an index)')
+    output.add_arguments(
+        parser, 'locations (or pairs of motif number and location with '
+        '--motifs)')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    main(args)
+    instrument.run(main, args)